@@ -1145,7 +1145,8 @@ def get_admin_stats():
                         COUNT(*) as sessions,
                         AVG(duration_minutes) as avg_duration
                     FROM occupancy_stats
-                    WHERE DATE(start_time) = DATE('now')
+                    WHERE start_time >= DATE('now', 'localtime')
+                    AND start_time < DATE('now', 'localtime', '+1 day')
                     GROUP BY strftime('%H', start_time)
                     ORDER BY hour
                 """)
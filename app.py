@@ -68,6 +68,12 @@ class QueueManagerApp:
             seconds=1,
             id='periodic_check'
         )
+        self.scheduler.add_job(
+            func=self.db.optimize,
+            trigger="interval",
+            hours=1,
+            id='db_optimize'
+        )
         
         # Register blueprints
         self.app.register_blueprint(api_bp, url_prefix='/api')
@@ -249,9 +255,9 @@ class QueueManagerApp:
                 self.current_state = 'OCCUPATO_PRENOTATO'
                 self.occupation_start = datetime.now()
                 
-                # Log user entered office event
-                self.db.log_event(
-                    event_type='USER_ENTERED_OFFICE',
+                # Log user entered office event (buffered, off the 1s periodic check)
+                self.db.enqueue_event(
+                    'USER_ENTERED_OFFICE',
                     user_code=self.reserved_for_user,
                     state_from='RISERVATO_ATTESA',
                     state_to='OCCUPATO_PRENOTATO',
@@ -268,9 +274,9 @@ class QueueManagerApp:
             self.reserved_for_user = None
             self.logger.info("Direct access granted")
             
-            # Log the event
-            self.db.log_event(
-                event_type='USER_ENTERED_OFFICE',
+            # Log the event (buffered, off the 1s periodic check)
+            self.db.enqueue_event(
+                'USER_ENTERED_OFFICE',
                 state_from='LIBERO',
                 state_to='OCCUPATO_DIRETTO',
                 details='Accesso diretto tramite pulsante'
@@ -525,6 +531,11 @@ class QueueManagerApp:
         except:
             pass
         
+        try:
+            self.db.close()
+        except:
+            pass
+        
         self.logger.info("Queue Manager System shutdown complete")
     
     def perform_startup_recovery(self):
@@ -692,20 +703,21 @@ class QueueManagerApp:
                     WHERE status = 'waiting' AND timestamp < ?
                 """, (cutoff_time.isoformat(),))
                 expired_users = [row['user_code'] for row in cursor.fetchall()]
-                
-                # Mark as no-show
-                for user_code in expired_users:
-                    self.db.mark_reservation_no_show(user_code)
-                    self.db.log_event(
-                        event_type='RESERVATION_EXPIRED',
-                        user_code=user_code,
-                        state_from='waiting',
-                        state_to='no_show',
-                        no_show=True,
-                        details='Expired during startup recovery'
-                    )
-                
-                return len(expired_users)
+            
+            # Mark as no-show (after releasing the connection: these take
+            # their own pooled connections)
+            for user_code in expired_users:
+                self.db.mark_reservation_no_show(user_code)
+            self.db.log_events_batch([{
+                'event_type': 'RESERVATION_EXPIRED',
+                'user_code': user_code,
+                'state_from': 'waiting',
+                'state_to': 'no_show',
+                'no_show': True,
+                'details': 'Expired during startup recovery'
+            } for user_code in expired_users])
+            
+            return len(expired_users)
                 
         except Exception as e:
             self.logger.error(f"Error cleaning expired reservations: {e}")
@@ -41,6 +41,9 @@ class Config:
     USE_ULTRASONIC_SENSOR = os.environ.get('USE_ULTRASONIC_SENSOR', 'True').lower() == 'true'
     DUAL_SENSOR_MODE = os.environ.get('DUAL_SENSOR_MODE', 'AND')  # 'AND' or 'OR'
     
+    # Display settings (minimum expected I2C clock, Hz)
+    DISPLAY_I2C_BAUDRATE = int(os.environ.get('DISPLAY_I2C_BAUDRATE', 400000))
+    
     # Warning settings
     WARNING_FLASH_INTERVAL_SECONDS = int(os.environ.get('WARNING_FLASH_INTERVAL_SECONDS', 2))
     
@@ -3,46 +3,379 @@ Database Manager for Queue Management System
 Handles all database operations using SQLite
 """
 
-import sqlite3
 import os
+import csv
+import json
+import queue
+import threading
+from io import StringIO
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Any
 import logging
 from contextlib import contextmanager
+from pathlib import Path
+from collections import OrderedDict
+
+try:
+    # Same DB-API module built against a newer bundled SQLite
+    # (optional; HAS_RETURNING below covers older system SQLite)
+    from pysqlite3 import dbapi2 as sqlite3
+except ImportError:
+    import sqlite3
 
 from config.config import Config
 
+# INSERT ... RETURNING (SQLite 3.35+); older libraries fall back to
+# lastrowid / rowcount
+HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+# Local time in ISO 8601 (same shape as datetime.now().isoformat()), computed by SQLite
+LOCAL_NOW_SQL = "strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime')"
+
+# Database schema, applied by DatabaseManager._create_tables
+SCHEMA_SQL = """
+-- Users table
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    code TEXT UNIQUE NOT NULL,
+    name TEXT NOT NULL,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Queue table
+CREATE TABLE IF NOT EXISTS queue (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_code TEXT NOT NULL,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    status TEXT DEFAULT 'waiting',
+    start_time DATETIME,
+    end_time DATETIME,
+    FOREIGN KEY (user_code) REFERENCES users(code)
+);
+
+-- Occupancy statistics table
+CREATE TABLE IF NOT EXISTS occupancy_stats (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    start_time DATETIME NOT NULL,
+    end_time DATETIME,
+    access_type TEXT NOT NULL,
+    user_code TEXT,
+    duration_minutes INTEGER,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_code) REFERENCES users(code)
+);
+
+-- Events table
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+    event_type TEXT NOT NULL,
+    user_code TEXT,
+    duration_minutes INTEGER,
+    state_from TEXT,
+    state_to TEXT,
+    queue_size INTEGER,
+    no_show BOOLEAN DEFAULT FALSE,
+    conflict_occurred BOOLEAN DEFAULT FALSE,
+    details TEXT
+);
+
+-- Configuration table
+CREATE TABLE IF NOT EXISTS config (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    description TEXT,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+) WITHOUT ROWID;
+
+-- Admin sessions table
+CREATE TABLE IF NOT EXISTS admin_sessions (
+    session_id TEXT PRIMARY KEY,
+    login_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+    last_activity DATETIME DEFAULT CURRENT_TIMESTAMP,
+    ip_address TEXT,
+    is_active BOOLEAN DEFAULT TRUE
+);
+
+-- Login attempts table
+CREATE TABLE IF NOT EXISTS login_attempts (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ip_address TEXT NOT NULL,
+    attempt_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+    success BOOLEAN DEFAULT FALSE,
+    lockout_until DATETIME
+);
+
+-- Per-day statistics for closed days (see get_daily_stats)
+CREATE TABLE IF NOT EXISTS daily_rollup (
+    date TEXT PRIMARY KEY,
+    total_occupations INTEGER NOT NULL,
+    avg_duration REAL,
+    total_minutes INTEGER,
+    access_types TEXT NOT NULL,
+    no_shows INTEGER NOT NULL,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Indexes for better performance
+CREATE INDEX IF NOT EXISTS idx_queue_status_ts ON queue(status, timestamp);
+CREATE INDEX IF NOT EXISTS idx_queue_timestamp ON queue(timestamp);
+CREATE INDEX IF NOT EXISTS idx_queue_user_status ON queue(user_code, status);
+CREATE INDEX IF NOT EXISTS idx_occupancy_user ON occupancy_stats(user_code);
+CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events(timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_type_ts ON events(event_type, timestamp);
+CREATE INDEX IF NOT EXISTS idx_events_noshow_ts ON events(timestamp) WHERE no_show = 1;
+CREATE INDEX IF NOT EXISTS idx_occupancy_start_type ON occupancy_stats(start_time, access_type, duration_minutes);
+CREATE INDEX IF NOT EXISTS idx_login_attempts_time ON login_attempts(attempt_time);
+CREATE INDEX IF NOT EXISTS idx_login_attempts_ip_time ON login_attempts(ip_address, attempt_time DESC);
+CREATE INDEX IF NOT EXISTS idx_admin_sessions_last_activity ON admin_sessions(last_activity);
+
+-- Superseded by the composite indexes above
+DROP INDEX IF EXISTS idx_queue_status;
+DROP INDEX IF EXISTS idx_events_type;
+DROP INDEX IF EXISTS idx_occupancy_start;
+"""
+
 class DatabaseManager:
     """Manages all database operations for the queue system"""
     
+    # Per-connection settings (journal_mode=WAL is persisted by initialize)
+    CONNECTION_PRAGMAS = (
+        "PRAGMA synchronous=NORMAL",
+        "PRAGMA temp_store=MEMORY",
+        "PRAGMA cache_size=-20000",  # ~20MB page cache
+        "PRAGMA mmap_size=268435456",  # 256MB
+        "PRAGMA foreign_keys=ON",
+    )
+    
+    # Compiled statements kept per connection, keyed by SQL text. Every
+    # statement in this module uses fixed SQL with bound parameters, so
+    # they all stay prepared on long-lived pooled connections.
+    STATEMENT_CACHE_SIZE = 128
+    
+    # Maximum number of pooled connections
+    POOL_SIZE = 4
+    
+    # How long to wait for a pooled connection before giving up
+    POOL_TIMEOUT_SECONDS = 10
+    
+    # Max entries in the user lookup cache before it is reset
+    USER_CACHE_SIZE = 256
+    
+    # Rows deleted per transaction by cleanup_old_data()
+    CLEANUP_CHUNK_SIZE = 5000
+    
+    # Pages copied per backup step before yielding to other connections
+    BACKUP_PAGES_PER_STEP = 1000
+    
+    # How often enqueue_event() buffers are written
+    EVENT_FLUSH_INTERVAL_SECONDS = 1.0
+    
+    INSERT_EVENT_SQL = """
+        INSERT INTO events 
+        (event_type, user_code, duration_minutes, state_from, state_to,
+         queue_size, no_show, conflict_occurred, details)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    
+    # Keys seeded by init_default_config (value is the Config attribute key.upper())
+    DEFAULT_CONFIG_DESCRIPTIONS = (
+        ('reservation_timeout_minutes', 'Timeout prenotazione in minuti'),
+        ('max_occupancy_minutes', 'Durata massima occupazione in minuti'),
+        ('max_queue_size', 'Dimensione massima della coda'),
+        ('movement_timeout_minutes', 'Timeout movimento in minuti'),
+        ('auto_reset_time', 'Orario reset automatico'),
+        ('conflict_priority', 'Priorità in caso di conflitto'),
+        ('use_pir_sensor', 'Usa sensore PIR'),
+        ('use_ultrasonic_sensor', 'Usa sensore ultrasonico'),
+        ('presence_threshold_cm', 'Soglia presenza in cm'),
+        ('dual_sensor_mode', 'Modalità sensori multipli'),
+        ('pir_absence_seconds', 'Secondi assenza PIR'),
+        ('ultrasonic_polling_seconds', 'Frequenza polling ultrasonico'),
+        ('pushover_enabled', 'Abilita notifiche Pushover'),
+        ('pushover_user_key', 'Chiave utente Pushover'),
+        ('pushover_api_token', 'Token API Pushover'),
+        ('session_timeout_minutes', 'Timeout sessione admin'),
+        ('max_login_attempts', 'Tentativi massimi login'),
+        ('lockout_duration_minutes', 'Durata blocco login'),
+    )
+    
+    # Dashboard descriptions for get_recent_events ("<label> - <details>")
+    EVENT_LABELS = {
+        'BOOKING_CREATED': 'Prenotazione creata',
+        'BOOKING_ACTIVATED': 'Turno attivato',
+        'BOOKING_CANCELLED': 'Prenotazione cancellata',
+        'OFFICE_OCCUPIED': 'Ufficio occupato',
+        'OFFICE_FREE': 'Ufficio liberato',
+        'NO_SHOW': 'No-show rilevato',
+        'CONFIG_CHANGED': 'Configurazione modificata',
+        'QUEUE_POSITION_CHANGED': 'Posizione in coda cambiata',
+        'QUEUE_CLEARED': 'Coda svuotata',
+        'SYSTEM_RESET': 'Sistema resettato',
+        'USER_ENTERED_OFFICE': 'Utente entrato in ufficio',
+        'USER_LEFT_OFFICE': "Utente uscito dall'ufficio",
+        'SYSTEM_RECOVERY': 'Sistema ripristinato dopo riavvio',
+        'NO_SHOW_CLEANUP': 'Pulizia no-show al riavvio',
+        'RESERVATION_EXPIRED': 'Prenotazione scaduta',
+    }
+    
     def __init__(self, db_path: str = None):
         self.db_path = db_path or Config.DATABASE_PATH
         self.logger = logging.getLogger(__name__)
         
+        # Connection pool (connections are opened lazily up to POOL_SIZE)
+        self._pool = queue.Queue(maxsize=self.POOL_SIZE)
+        self._pool_lock = threading.Lock()
+        self._pool_created = 0
+        
+        # Read-only connection for long analytics queries (see read_connection)
+        self._read_conn = None
+        self._read_lock = threading.Lock()
+        
+        # User code -> name cache (None for unknown codes)
+        self._user_cache = {}
+        self._user_cache_lock = threading.Lock()
+        self._user_cache_generation = 0
+        
+        # Buffered events (see enqueue_event)
+        self._event_buffer = []
+        self._event_lock = threading.Lock()
+        self._event_stop = None  # Stop event of the running flush thread
+        self._event_thread = None
+        
+        # In-memory mirror of waiting queue rows, in queue order:
+        # reservation id -> (user_code, timestamp). Loaded on first use;
+        # every queue write goes through this class and updates it.
+        self._waiting = None
+        self._waiting_lock = threading.Lock()
+        
         # Ensure data directory exists
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
     
     @contextmanager
     def get_connection(self):
-        """Context manager for database connections"""
-        conn = None
+        """Context manager for pooled database connections"""
+        conn = self._acquire_connection()
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.row_factory = sqlite3.Row  # Enable dict-like access
             yield conn
         except Exception as e:
-            if conn:
-                conn.rollback()
+            conn.rollback()
             self.logger.error(f"Database error: {e}")
             raise
         finally:
-            if conn:
+            # Never hand an open transaction to the next caller
+            if conn.in_transaction:
+                conn.rollback()
+            self._pool.put(conn)
+    
+    @contextmanager
+    def read_connection(self):
+        """Context manager for the read-only analytics connection
+        
+        Long statistics scans run here instead of on a pooled connection,
+        so they never hold up queue writes; under WAL the writer and this
+        reader don't block each other.
+        """
+        with self._read_lock:
+            if self._read_conn is None:
+                uri = Path(self.db_path).resolve().as_uri() + "?mode=ro"
+                self._read_conn = sqlite3.connect(uri, uri=True, check_same_thread=False,
+                                                  cached_statements=self.STATEMENT_CACHE_SIZE)
+                self._read_conn.row_factory = sqlite3.Row
+                self._configure_connection(self._read_conn)
+            try:
+                yield self._read_conn
+            except Exception as e:
+                self.logger.error(f"Database error: {e}")
+                raise
+            finally:
+                # End the read transaction so the WAL can be checkpointed
+                if self._read_conn.in_transaction:
+                    self._read_conn.rollback()
+    
+    def _open_connection(self) -> sqlite3.Connection:
+        """Open a new connection configured for pooling"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False,
+                               cached_statements=self.STATEMENT_CACHE_SIZE)
+        conn.row_factory = sqlite3.Row  # Enable dict-like access
+        self._configure_connection(conn)
+        return conn
+    
+    def _acquire_connection(self) -> sqlite3.Connection:
+        """Get an idle pooled connection, opening one if the pool isn't full"""
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            pass
+        
+        with self._pool_lock:
+            if self._pool_created < self.POOL_SIZE:
+                conn = self._open_connection()
+                self._pool_created += 1
+                return conn
+        
+        # Pool exhausted, wait for a connection to be released; fail
+        # instead of blocking forever (e.g. a caller nesting pool use)
+        try:
+            return self._pool.get(timeout=self.POOL_TIMEOUT_SECONDS)
+        except queue.Empty:
+            raise sqlite3.OperationalError(
+                f"No pooled connection released within {self.POOL_TIMEOUT_SECONDS}s"
+            ) from None
+    
+    @staticmethod
+    def _tuple_cursor(conn: sqlite3.Connection) -> sqlite3.Cursor:
+        """Cursor returning plain tuples, for bulk reads unpacked by position"""
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        return cursor
+    
+    def _configure_connection(self, conn: sqlite3.Connection):
+        """Apply per-connection PRAGMAs"""
+        for pragma in self.CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+    
+    def close(self):
+        """Flush buffered events and close all idle pooled connections"""
+        # Stop the flush thread; a later enqueue_event() starts a new one
+        with self._event_lock:
+            thread, self._event_thread = self._event_thread, None
+            if thread:
+                self._event_stop.set()
+        if thread:
+            thread.join()
+        try:
+            self.flush_events()
+        except Exception as e:
+            self.logger.error(f"Error flushing events on close: {e}")
+        
+        with self._pool_lock:
+            while True:
+                try:
+                    conn = self._pool.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    # Recommended by SQLite before closing long-lived connections
+                    conn.execute("PRAGMA optimize")
+                except sqlite3.Error:
+                    pass
                 conn.close()
+                self._pool_created -= 1
+        
+        with self._read_lock:
+            if self._read_conn is not None:
+                self._read_conn.close()
+                self._read_conn = None
     
     def initialize(self) -> bool:
         """Initialize database with required tables"""
         try:
             with self.get_connection() as conn:
+                # WAL is stored in the database header, so this persists
+                # for every later connection
+                conn.execute("PRAGMA journal_mode=WAL")
+                
                 # Create tables
                 self._create_tables(conn)
                 
@@ -50,118 +383,46 @@ class DatabaseManager:
                 self._insert_default_data(conn)
                 
                 conn.commit()
-                self.logger.info("Database initialized successfully")
-                return True
+                self._invalidate_user_cache()
+                
+                # Refresh planner statistics so the indexes above get used
+                conn.execute("ANALYZE")
+            
+            self._prewarm()
+            self.logger.info(f"Database initialized successfully (SQLite {sqlite3.sqlite_version})")
+            return True
                 
         except Exception as e:
             self.logger.error(f"Failed to initialize database: {e}")
             return False
     
+    def _prewarm(self):
+        """Run the hot read paths once at startup
+        
+        Prepares their statements in the connection's statement cache, pulls
+        their pages into the page cache and loads the waiting queue mirror,
+        so the first dashboard request doesn't pay for it.
+        """
+        self.get_queue()
+        self.get_recent_events(limit=1)
+        self.get_system_recovery_stats()
+    
     def _create_tables(self, conn: sqlite3.Connection):
-        """Create all required tables"""
-        
-        # Users table
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                code TEXT UNIQUE NOT NULL,
-                name TEXT NOT NULL,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Queue table
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS queue (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_code TEXT NOT NULL,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                status TEXT DEFAULT 'waiting',
-                start_time DATETIME,
-                end_time DATETIME,
-                FOREIGN KEY (user_code) REFERENCES users(code)
-            )
-        """)
-        
-        # Occupancy statistics table
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS occupancy_stats (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                start_time DATETIME NOT NULL,
-                end_time DATETIME,
-                access_type TEXT NOT NULL,
-                user_code TEXT,
-                duration_minutes INTEGER,
-                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_code) REFERENCES users(code)
-            )
-        """)
-        
-        # Events table
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS events (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-                event_type TEXT NOT NULL,
-                user_code TEXT,
-                duration_minutes INTEGER,
-                state_from TEXT,
-                state_to TEXT,
-                queue_size INTEGER,
-                no_show BOOLEAN DEFAULT FALSE,
-                conflict_occurred BOOLEAN DEFAULT FALSE,
-                details TEXT
-            )
-        """)
-        
-        # Configuration table
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS config (
-                key TEXT PRIMARY KEY,
-                value TEXT NOT NULL,
-                description TEXT,
-                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        # Admin sessions table
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS admin_sessions (
-                session_id TEXT PRIMARY KEY,
-                login_time DATETIME DEFAULT CURRENT_TIMESTAMP,
-                last_activity DATETIME DEFAULT CURRENT_TIMESTAMP,
-                ip_address TEXT,
-                is_active BOOLEAN DEFAULT TRUE
-            )
-        """)
-        
-        # Login attempts table
-        conn.execute("""
-            CREATE TABLE IF NOT EXISTS login_attempts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                ip_address TEXT NOT NULL,
-                attempt_time DATETIME DEFAULT CURRENT_TIMESTAMP,
-                success BOOLEAN DEFAULT FALSE,
-                lockout_until DATETIME
-            )
-        """)
+        """Create all required tables
         
-        # Create indexes for better performance
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_queue_status ON queue(status)")
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_queue_timestamp ON queue(timestamp)")
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events(timestamp)")
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_events_type ON events(event_type)")
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_occupancy_start ON occupancy_stats(start_time)")
+        Runs SCHEMA_SQL in one round trip and leaves its transaction open,
+        so the default data inserted next is committed together with it.
+        """
+        conn.executescript("BEGIN;\n" + SCHEMA_SQL)
     
     def _insert_default_data(self, conn: sqlite3.Connection):
         """Insert default users and configuration"""
         
         # Insert default users if they don't exist
-        for user in Config.DEFAULT_USERS:
-            conn.execute(
-                "INSERT OR IGNORE INTO users (code, name) VALUES (?, ?)",
-                (user['code'], user['name'])
-            )
+        conn.executemany(
+            "INSERT OR IGNORE INTO users (code, name) VALUES (?, ?)",
+            [(user['code'], user['name']) for user in Config.DEFAULT_USERS]
+        )
         
         # Insert default configuration
         default_config = {
@@ -179,31 +440,54 @@ class DatabaseManager:
             'pushover_enabled': str(Config.PUSHOVER_ENABLED)
         }
         
-        for key, value in default_config.items():
-            conn.execute(
-                "INSERT OR IGNORE INTO config (key, value) VALUES (?, ?)",
-                (key, value)
-            )
+        conn.executemany(
+            "INSERT OR IGNORE INTO config (key, value) VALUES (?, ?)",
+            default_config.items()
+        )
     
     # User management methods
     def get_users(self) -> List[Dict]:
         """Get all users"""
         with self.get_connection() as conn:
-            cursor = conn.execute("SELECT code, name FROM users ORDER BY name")
-            return [dict(row) for row in cursor.fetchall()]
+            cursor = self._tuple_cursor(conn)
+            cursor.execute("SELECT code, name FROM users ORDER BY name")
+            return [{'code': code, 'name': name} for code, name in cursor]
     
     def user_exists(self, user_code: str) -> bool:
         """Check if user exists"""
-        with self.get_connection() as conn:
-            cursor = conn.execute("SELECT 1 FROM users WHERE code = ?", (user_code,))
-            return cursor.fetchone() is not None
+        return self._lookup_user_name(user_code) is not None
     
     def get_user_name(self, user_code: str) -> Optional[str]:
         """Get user name by code"""
+        return self._lookup_user_name(user_code)
+    
+    def _lookup_user_name(self, user_code: str) -> Optional[str]:
+        """Cached user name lookup (name is NOT NULL, so None means no user)"""
+        try:
+            return self._user_cache[user_code]
+        except KeyError:
+            pass
+        
+        generation = self._user_cache_generation
         with self.get_connection() as conn:
             cursor = conn.execute("SELECT name FROM users WHERE code = ?", (user_code,))
             row = cursor.fetchone()
-            return row['name'] if row else None
+            name = row['name'] if row else None
+        
+        with self._user_cache_lock:
+            # Don't store a result read before a concurrent invalidation
+            if generation == self._user_cache_generation:
+                if len(self._user_cache) >= self.USER_CACHE_SIZE:
+                    self._user_cache.clear()
+                self._user_cache[user_code] = name
+        
+        return name
+    
+    def _invalidate_user_cache(self):
+        """Drop cached user lookups after users change"""
+        with self._user_cache_lock:
+            self._user_cache_generation += 1
+            self._user_cache.clear()
     
     def add_user(self, user_code: str, name: str) -> bool:
         """Add new user"""
@@ -214,6 +498,7 @@ class DatabaseManager:
                     (user_code, name)
                 )
                 conn.commit()
+                self._invalidate_user_cache()
                 return True
         except sqlite3.IntegrityError:
             return False
@@ -227,6 +512,7 @@ class DatabaseManager:
                     (name, user_code)
                 )
                 conn.commit()
+                self._invalidate_user_cache()
                 return cursor.rowcount > 0
         except sqlite3.Error:
             return False
@@ -235,23 +521,24 @@ class DatabaseManager:
         """Delete user if not in queue or has no history"""
         try:
             with self.get_connection() as conn:
-                # Check if user has queue entries or occupancy history
-                cursor = conn.execute(
-                    "SELECT 1 FROM queue WHERE user_code = ? UNION SELECT 1 FROM occupancy_stats WHERE user_code = ? LIMIT 1",
-                    (user_code, user_code)
-                )
-                if cursor.fetchone():
-                    return False  # User has history, cannot delete
-                
-                cursor = conn.execute(
-                    "DELETE FROM users WHERE code = ?",
-                    (user_code,)
-                )
+                deleted = self._delete_user(conn, user_code)
                 conn.commit()
-                return cursor.rowcount > 0
+                self._invalidate_user_cache()
+                return deleted
         except sqlite3.Error:
             return False
     
+    def _delete_user(self, conn: sqlite3.Connection, user_code: str) -> bool:
+        """Delete user on an open connection (caller commits)"""
+        # Only delete users without queue entries or occupancy history
+        cursor = conn.execute("""
+            DELETE FROM users
+            WHERE code = ?
+            AND NOT EXISTS (SELECT 1 FROM queue WHERE user_code = users.code)
+            AND NOT EXISTS (SELECT 1 FROM occupancy_stats WHERE user_code = users.code)
+        """, (user_code,))
+        return cursor.rowcount > 0
+    
     def get_user(self, user_code: str) -> Optional[Dict]:
         """Get user details by code"""
         with self.get_connection() as conn:
@@ -260,25 +547,28 @@ class DatabaseManager:
                 (user_code,)
             )
             row = cursor.fetchone()
-            return dict(row) if row else None
+            return {'code': row['code'], 'name': row['name']} if row else None
     
     def validate_user_code(self, user_code: str) -> bool:
         """Validate user code format (2 digits)"""
-        import re
-        return bool(re.match(r'^\d{2}$', user_code))
+        return len(user_code) == 2 and user_code.isdecimal()
     
     def bulk_delete_users(self, user_codes: List[str]) -> Dict[str, bool]:
         """Delete multiple users, returns dict with success/failure for each"""
         results = {}
-        for code in user_codes:
-            results[code] = self.delete_user(code)
+        try:
+            # Single transaction for the whole batch
+            with self.get_connection() as conn:
+                for code in user_codes:
+                    results[code] = self._delete_user(conn, code)
+                conn.commit()
+                self._invalidate_user_cache()
+        except sqlite3.Error:
+            return {code: False for code in user_codes}
         return results
     
     def import_users_from_csv(self, csv_data: str) -> Dict[str, Any]:
         """Import users from CSV data"""
-        import csv
-        from io import StringIO
-        
         results = {
             'success': 0,
             'errors': 0,
@@ -287,6 +577,11 @@ class DatabaseManager:
             'details': []
         }
         
+        # Validated rows, inserted together below
+        pending = []
+        # (row_num, message) per row, reported in CSV row order
+        row_details = []
+        
         try:
             csv_file = StringIO(csv_data)
             reader = csv.DictReader(csv_file)
@@ -297,29 +592,59 @@ class DatabaseManager:
                 
                 if not code or not name:
                     results['invalid'] += 1
-                    results['details'].append(f"Riga {row_num}: Codice o nome mancante")
+                    row_details.append((row_num, f"Riga {row_num}: Codice o nome mancante"))
                     continue
                 
                 if not self.validate_user_code(code):
                     results['invalid'] += 1
-                    results['details'].append(f"Riga {row_num}: Codice '{code}' non valido (deve essere 2 cifre)")
-                    continue
-                
-                if self.user_exists(code):
-                    results['duplicates'] += 1
-                    results['details'].append(f"Riga {row_num}: Utente '{code}' già esistente")
+                    row_details.append((row_num, f"Riga {row_num}: Codice '{code}' non valido (deve essere 2 cifre)"))
                     continue
                 
-                if self.add_user(code, name):
-                    results['success'] += 1
-                else:
-                    results['errors'] += 1
-                    results['details'].append(f"Riga {row_num}: Errore nell'aggiungere utente '{code}'")
+                pending.append((row_num, code, name))
                     
         except Exception as e:
             results['details'].append(f"Errore nella lettura del CSV: {str(e)}")
             results['errors'] += 1
         
+        if pending:
+            # Only reported once the transaction commits
+            duplicate_details = []
+            try:
+                # Single transaction for the whole import
+                with self.get_connection() as conn:
+                    for row_num, code, name in pending:
+                        if HAS_RETURNING:
+                            inserted = conn.execute(
+                                "INSERT INTO users (code, name) VALUES (?, ?) "
+                                "ON CONFLICT(code) DO NOTHING RETURNING id",
+                                (code, name)
+                            ).fetchone() is not None
+                        else:
+                            inserted = conn.execute(
+                                "INSERT OR IGNORE INTO users (code, name) VALUES (?, ?)",
+                                (code, name)
+                            ).rowcount == 1
+                        if inserted:
+                            results['success'] += 1
+                        else:
+                            results['duplicates'] += 1
+                            duplicate_details.append((row_num, f"Riga {row_num}: Utente '{code}' già esistente"))
+                    conn.commit()
+                    self._invalidate_user_cache()
+                row_details.extend(duplicate_details)
+            except sqlite3.Error as e:
+                # Rolled back: every pending row counts as an error, once
+                results['success'] = 0
+                results['duplicates'] = 0
+                results['errors'] += len(pending)
+                results['details'].append(f"Errore nell'importazione utenti: {str(e)}")
+        
+        # Row messages first, in row order, then CSV/database errors
+        results['details'][:0] = [message for _, message in sorted(row_details)]
+        
+        if results['success']:
+            self.analyze()
+        
         return results
     
     def delete_all_users(self) -> bool:
@@ -338,98 +663,162 @@ class DatabaseManager:
                 
                 cursor = conn.execute("DELETE FROM users")
                 conn.commit()
+                self._invalidate_user_cache()
                 return True
         except sqlite3.Error:
             return False
     
     # Queue management methods
+    def _waiting_queue(self) -> OrderedDict:
+        """Waiting queue mirror, loaded from the database on first use
+        
+        Must be called with _waiting_lock held.
+        """
+        if self._waiting is None:
+            with self.get_connection() as conn:
+                cursor = self._tuple_cursor(conn)
+                cursor.execute("""
+                    SELECT id, user_code, timestamp FROM queue
+                    WHERE status = 'waiting'
+                    ORDER BY timestamp, id
+                """)
+                self._waiting = OrderedDict(
+                    (reservation_id, (user_code, timestamp))
+                    for reservation_id, user_code, timestamp in cursor
+                )
+        return self._waiting
+    
+    def _queue_entry(self, reservation_id: int, user_code: str,
+                     timestamp: str) -> Optional[Dict]:
+        """Build a get_queue() entry, None if the user no longer exists"""
+        user_name = self._lookup_user_name(user_code)
+        if user_name is None:
+            return None
+        return {
+            'id': reservation_id,
+            'user_code': user_code,
+            'timestamp': timestamp,
+            'status': 'waiting',
+            'user_name': user_name
+        }
+    
     def get_queue(self) -> List[Dict]:
         """Get current queue ordered by timestamp"""
-        with self.get_connection() as conn:
-            cursor = conn.execute("""
-                SELECT q.id, q.user_code, q.timestamp, q.status, u.name as user_name
-                FROM queue q
-                JOIN users u ON q.user_code = u.code
-                WHERE q.status = 'waiting'
-                ORDER BY q.timestamp
-            """)
-            return [dict(row) for row in cursor.fetchall()]
+        with self._waiting_lock:
+            entries = list(self._waiting_queue().items())
+        
+        queue = []
+        for reservation_id, (user_code, timestamp) in entries:
+            entry = self._queue_entry(reservation_id, user_code, timestamp)
+            if entry:
+                queue.append(entry)
+        return queue
     
     def add_to_queue(self, user_code: str) -> int:
         """Add user to queue, returns reservation ID"""
-        with self.get_connection() as conn:
-            cursor = conn.execute(
-                "INSERT INTO queue (user_code) VALUES (?)",
-                (user_code,)
-            )
-            conn.commit()
-            return cursor.lastrowid
+        with self._waiting_lock:
+            waiting = self._waiting_queue()
+            with self.get_connection() as conn:
+                if HAS_RETURNING:
+                    # RETURNING hands back the id and default timestamp of this
+                    # exact row, no lastrowid or follow-up SELECT needed
+                    reservation_id, timestamp = conn.execute(
+                        "INSERT INTO queue (user_code) VALUES (?) RETURNING id, timestamp",
+                        (user_code,)
+                    ).fetchone()
+                else:
+                    # Same connection and transaction, so lastrowid is this row
+                    reservation_id = conn.execute(
+                        "INSERT INTO queue (user_code) VALUES (?)", (user_code,)
+                    ).lastrowid
+                    timestamp = conn.execute(
+                        "SELECT timestamp FROM queue WHERE id = ?", (reservation_id,)
+                    ).fetchone()[0]
+                conn.commit()
+            waiting[reservation_id] = (user_code, timestamp)
+            return reservation_id
     
     def mark_reservation_active(self, reservation_id: int):
         """Mark reservation as active"""
-        with self.get_connection() as conn:
-            conn.execute(
-                "UPDATE queue SET status = 'active', start_time = ? WHERE id = ?",
-                (datetime.now().isoformat(), reservation_id)
-            )
-            conn.commit()
+        with self._waiting_lock:
+            waiting = self._waiting_queue()
+            with self.get_connection() as conn:
+                conn.execute(
+                    f"UPDATE queue SET status = 'active', start_time = {LOCAL_NOW_SQL} WHERE id = ?",
+                    (reservation_id,)
+                )
+                conn.commit()
+            waiting.pop(reservation_id, None)
     
     def mark_reservation_completed(self, reservation_id: int):
         """Mark reservation as completed"""
-        with self.get_connection() as conn:
-            conn.execute(
-                "UPDATE queue SET status = 'completed', end_time = ? WHERE id = ?",
-                (datetime.now().isoformat(), reservation_id)
-            )
-            conn.commit()
+        with self._waiting_lock:
+            waiting = self._waiting_queue()
+            with self.get_connection() as conn:
+                conn.execute(
+                    f"UPDATE queue SET status = 'completed', end_time = {LOCAL_NOW_SQL} WHERE id = ?",
+                    (reservation_id,)
+                )
+                conn.commit()
+            waiting.pop(reservation_id, None)
     
     def mark_reservation_no_show(self, user_code: str):
         """Mark reservation as no-show"""
-        with self.get_connection() as conn:
-            conn.execute(
-                "UPDATE queue SET status = 'no_show' WHERE user_code = ? AND status IN ('waiting', 'reserved')",
-                (user_code,)
-            )
-            conn.commit()
+        with self._waiting_lock:
+            waiting = self._waiting_queue()
+            with self.get_connection() as conn:
+                conn.execute(
+                    "UPDATE queue SET status = 'no_show' WHERE user_code = ? AND status IN ('waiting', 'reserved')",
+                    (user_code,)
+                )
+                conn.commit()
+            self._drop_waiting_user(waiting, user_code)
     
     def remove_from_queue(self, user_code: str) -> bool:
         """Remove user from queue"""
-        with self.get_connection() as conn:
-            cursor = conn.execute(
-                "DELETE FROM queue WHERE user_code = ? AND status = 'waiting'",
-                (user_code,)
-            )
-            conn.commit()
+        with self._waiting_lock:
+            waiting = self._waiting_queue()
+            with self.get_connection() as conn:
+                cursor = conn.execute(
+                    "DELETE FROM queue WHERE user_code = ? AND status = 'waiting'",
+                    (user_code,)
+                )
+                conn.commit()
+            self._drop_waiting_user(waiting, user_code)
             return cursor.rowcount > 0
     
+    @staticmethod
+    def _drop_waiting_user(waiting: OrderedDict, user_code: str):
+        """Remove every mirrored waiting entry of a user"""
+        for reservation_id in [rid for rid, (code, _) in waiting.items() if code == user_code]:
+            del waiting[reservation_id]
+    
     def clear_queue(self):
         """Clear entire queue"""
-        with self.get_connection() as conn:
-            conn.execute("DELETE FROM queue WHERE status = 'waiting'")
-            conn.commit()
+        with self._waiting_lock:
+            with self.get_connection() as conn:
+                conn.execute("DELETE FROM queue WHERE status = 'waiting'")
+                conn.commit()
+            self._waiting = OrderedDict()
     
     def get_queue_position(self, user_code: str) -> Optional[int]:
         """Get user's position in queue (1-indexed)"""
-        with self.get_connection() as conn:
-            cursor = conn.execute("""
-                SELECT ROW_NUMBER() OVER (ORDER BY timestamp) as position
-                FROM queue
-                WHERE user_code = ? AND status = 'waiting'
-            """, (user_code,))
-            row = cursor.fetchone()
-            return row['position'] if row else None
+        with self._waiting_lock:
+            for position, (code, _) in enumerate(self._waiting_queue().values(), 1):
+                if code == user_code:
+                    return position
+        return None
     
     def get_user_in_queue(self, user_code: str) -> Optional[Dict]:
         """Get user's queue entry if they are currently in queue"""
-        with self.get_connection() as conn:
-            cursor = conn.execute("""
-                SELECT q.id, q.user_code, q.timestamp, q.status, u.name as user_name
-                FROM queue q
-                JOIN users u ON q.user_code = u.code
-                WHERE q.user_code = ? AND q.status = 'waiting'
-            """, (user_code,))
-            row = cursor.fetchone()
-            return dict(row) if row else None
+        with self._waiting_lock:
+            match = next(
+                ((rid, ts) for rid, (code, ts) in self._waiting_queue().items() if code == user_code),
+                None
+            )
+        if match is None:
+            return None
+        return self._queue_entry(match[0], user_code, match[1])
     
     # Statistics and analytics methods
     def log_occupancy(self, start_time: datetime, end_time: datetime, 
@@ -443,6 +832,10 @@ class DatabaseManager:
                 VALUES (?, ?, ?, ?, ?)
             """, (start_time.isoformat(), end_time.isoformat(), 
                   access_type, user_code, duration_minutes))
+            
+            # The day's rollup (if any) no longer matches
+            conn.execute("DELETE FROM daily_rollup WHERE date = ?",
+                         (start_time.strftime('%Y-%m-%d'),))
             conn.commit()
     
     def log_event(self, event_type: str, user_code: str = None, 
@@ -452,15 +845,72 @@ class DatabaseManager:
                   details: str = None):
         """Log system event"""
         with self.get_connection() as conn:
-            conn.execute("""
-                INSERT INTO events 
-                (event_type, user_code, duration_minutes, state_from, state_to,
-                 queue_size, no_show, conflict_occurred, details)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (event_type, user_code, duration_minutes, state_from, state_to,
-                  queue_size, no_show, conflict_occurred, details))
+            conn.execute(self.INSERT_EVENT_SQL, (
+                event_type, user_code, duration_minutes, state_from, state_to,
+                queue_size, no_show, conflict_occurred, details))
+            if no_show:
+                self._invalidate_current_rollup(conn)
+            conn.commit()
+    
+    @staticmethod
+    def _event_params(event_type: str, user_code: str = None,
+                      duration_minutes: int = None, state_from: str = None,
+                      state_to: str = None, queue_size: int = None,
+                      no_show: bool = False, conflict_occurred: bool = False,
+                      details: str = None) -> tuple:
+        """Build INSERT_EVENT_SQL parameters from log_event() arguments"""
+        return (event_type, user_code, duration_minutes, state_from, state_to,
+                queue_size, no_show, conflict_occurred, details)
+    
+    def log_events_batch(self, events: List[Dict]):
+        """Log several system events in one transaction
+        
+        Each dict takes the same keys as log_event() arguments.
+        """
+        if not events:
+            return
+        
+        params = [self._event_params(**event) for event in events]
+        with self.get_connection() as conn:
+            conn.executemany(self.INSERT_EVENT_SQL, params)
+            if any(event.get('no_show') for event in events):
+                self._invalidate_current_rollup(conn)
             conn.commit()
     
+    def _invalidate_current_rollup(self, conn: sqlite3.Connection):
+        """Drop the rollup of the day new events are stamped with
+        
+        Events default to CURRENT_TIMESTAMP (UTC), which can still fall on
+        a day that is already closed in local time.
+        """
+        conn.execute("DELETE FROM daily_rollup WHERE date = DATE('now')")
+    
+    def enqueue_event(self, event_type: str, **kwargs):
+        """Buffer an event for the background writer instead of committing now"""
+        with self._event_lock:
+            self._event_buffer.append(dict(kwargs, event_type=event_type))
+            
+            if self._event_thread is None:
+                self._event_stop = threading.Event()
+                self._event_thread = threading.Thread(target=self._event_flush_loop,
+                                                      args=(self._event_stop,), daemon=True)
+                self._event_thread.start()
+    
+    def flush_events(self):
+        """Write all buffered events"""
+        with self._event_lock:
+            events, self._event_buffer = self._event_buffer, []
+        
+        self.log_events_batch(events)
+    
+    def _event_flush_loop(self, stop: threading.Event):
+        """Background thread flushing buffered events until stop is set"""
+        while not stop.wait(self.EVENT_FLUSH_INTERVAL_SECONDS):
+            try:
+                self.flush_events()
+            except Exception as e:
+                self.logger.error(f"Error flushing events: {e}")
+    
     def get_comprehensive_stats(self, date: datetime = None, period: str = 'day') -> Dict:
         """Get comprehensive statistics including no-shows, access types, etc."""
         if date is None:
@@ -480,22 +930,47 @@ class DatabaseManager:
         else:
             raise ValueError("Period must be 'day', 'week', or 'month'")
         
-        with self.get_connection() as conn:
+        with self.read_connection() as conn:
             stats = {}
             
-            # === OCCUPANCY STATISTICS ===
+            # === OCCUPANCY, NO-SHOW, BOOKING AND QUEUE STATISTICS ===
+            # One statement; each subquery is served by its own index
             cursor = conn.execute("""
+                WITH occ AS (
+                    SELECT 
+                        COUNT(*) as total_occupations,
+                        AVG(duration_minutes) as avg_duration,
+                        SUM(duration_minutes) as total_usage_minutes,
+                        MAX(duration_minutes) as max_duration,
+                        MIN(duration_minutes) as min_duration
+                    FROM occupancy_stats
+                    WHERE start_time >= :start AND start_time < :end
+                    AND duration_minutes IS NOT NULL
+                )
                 SELECT 
-                    COUNT(*) as total_occupations,
-                    AVG(duration_minutes) as avg_duration,
-                    SUM(duration_minutes) as total_usage_minutes,
-                    MAX(duration_minutes) as max_duration,
-                    MIN(duration_minutes) as min_duration
-                FROM occupancy_stats
-                WHERE start_time >= ? AND start_time < ?
-                AND duration_minutes IS NOT NULL
-            """, (start_date, end_date))
-            occupancy_stats = dict(cursor.fetchone())
+                    occ.*,
+                    (SELECT COUNT(*) FROM events
+                     WHERE timestamp >= :start AND timestamp < :end
+                     AND event_type = 'NO_SHOW' AND no_show = 1) as no_show_count,
+                    (SELECT COUNT(*) FROM events
+                     WHERE timestamp >= :start AND timestamp < :end
+                     AND event_type = 'BOOKING_CREATED') as total_bookings,
+                    (SELECT MAX(queue_size) FROM events
+                     WHERE timestamp >= :start AND timestamp < :end
+                     AND queue_size IS NOT NULL) as max_queue_size,
+                    (SELECT AVG(queue_size) FROM events
+                     WHERE timestamp >= :start AND timestamp < :end
+                     AND queue_size IS NOT NULL) as avg_queue_size
+                FROM occ
+            """, {'start': start_date, 'end': end_date})
+            row = cursor.fetchone()
+            occupancy_stats = {key: row[key] for key in (
+                'total_occupations', 'avg_duration', 'total_usage_minutes',
+                'max_duration', 'min_duration')}
+            no_show_stats = {'no_show_count': row['no_show_count']}
+            booking_stats = {'total_bookings': row['total_bookings']}
+            queue_stats = {'max_queue_size': row['max_queue_size'],
+                           'avg_queue_size': row['avg_queue_size']}
             stats['occupancy'] = occupancy_stats
             
             # === ACCESS TYPE BREAKDOWN ===
@@ -516,36 +991,6 @@ class DatabaseManager:
                 }
             stats['access_types'] = access_types
             
-            # === NO-SHOW STATISTICS ===
-            cursor = conn.execute("""
-                SELECT COUNT(*) as no_show_count
-                FROM events
-                WHERE timestamp >= ? AND timestamp < ?
-                AND event_type = 'NO_SHOW'
-                AND no_show = 1
-            """, (start_date, end_date))
-            no_show_stats = dict(cursor.fetchone())
-            
-            # === BOOKING STATISTICS ===
-            cursor = conn.execute("""
-                SELECT COUNT(*) as total_bookings
-                FROM events
-                WHERE timestamp >= ? AND timestamp < ?
-                AND event_type = 'BOOKING_CREATED'
-            """, (start_date, end_date))
-            booking_stats = dict(cursor.fetchone())
-            
-            # === QUEUE STATISTICS ===
-            cursor = conn.execute("""
-                SELECT 
-                    MAX(queue_size) as max_queue_size,
-                    AVG(queue_size) as avg_queue_size
-                FROM events
-                WHERE timestamp >= ? AND timestamp < ?
-                AND queue_size IS NOT NULL
-            """, (start_date, end_date))
-            queue_stats = dict(cursor.fetchone())
-            
             # === COMBINE STATISTICS ===
             stats.update({
                 'no_shows': no_show_stats,
@@ -571,37 +1016,7 @@ class DatabaseManager:
             date = datetime.now()
         
         date_str = date.strftime('%Y-%m-%d')
-        
-        with self.get_connection() as conn:
-            # Total occupations
-            cursor = conn.execute("""
-                SELECT COUNT(*) as total_occupations,
-                       AVG(duration_minutes) as avg_duration,
-                       SUM(duration_minutes) as total_minutes
-                FROM occupancy_stats
-                WHERE DATE(start_time) = ?
-            """, (date_str,))
-            stats = dict(cursor.fetchone())
-            
-            # Access type breakdown
-            cursor = conn.execute("""
-                SELECT access_type, COUNT(*) as count
-                FROM occupancy_stats
-                WHERE DATE(start_time) = ?
-                GROUP BY access_type
-            """, (date_str,))
-            stats['access_types'] = {row['access_type']: row['count'] 
-                                   for row in cursor.fetchall()}
-            
-            # No-show count
-            cursor = conn.execute("""
-                SELECT COUNT(*) as no_shows
-                FROM events
-                WHERE DATE(timestamp) = ? AND no_show = 1
-            """, (date_str,))
-            stats['no_shows'] = cursor.fetchone()['no_shows']
-            
-            return stats
+        return self._get_stats_for_dates([date_str])[date_str]
     
     def get_average_occupation_time(self) -> Optional[int]:
         """Get average occupation time in minutes from recent data"""
@@ -622,27 +1037,131 @@ class DatabaseManager:
         if start_date is None:
             start_date = datetime.now() - timedelta(days=7)
         
-        stats = []
-        for i in range(7):
-            date = start_date + timedelta(days=i)
-            daily_stats = self.get_daily_stats(date)
-            daily_stats['date'] = date.strftime('%Y-%m-%d')
-            stats.append(daily_stats)
+        dates = [(start_date + timedelta(days=i)).strftime('%Y-%m-%d') for i in range(7)]
+        daily_stats = self._get_stats_for_dates(dates)
+        
+        return [dict(daily_stats[date], date=date) for date in dates]
+    
+    def _get_stats_for_dates(self, dates: List[str]) -> Dict[str, Dict]:
+        """Per-day stats for 'YYYY-MM-DD' dates
+        
+        Closed days (before today) come from daily_rollup and are
+        computed and stored on first use; today is always computed live.
+        """
+        today = datetime.now().strftime('%Y-%m-%d')
+        
+        with self.get_connection() as conn:
+            stats = self._read_daily_rollup(conn, min(dates), max(dates))
+            stats = {date: stats[date] for date in dates if date in stats}
+            
+            missing = [date for date in dates if date not in stats]
+            if missing:
+                live = self._compute_daily_stats(conn, missing)
+                stats.update(live)
+                
+                closed = {date: live[date] for date in missing if date < today}
+                if closed:
+                    self._store_daily_rollup(conn, closed)
+                    conn.commit()
+        
+        return stats
+    
+    def _read_daily_rollup(self, conn: sqlite3.Connection,
+                           first_date: str, last_date: str) -> Dict[str, Dict]:
+        """Stored rollups for dates in [first_date, last_date]"""
+        cursor = conn.execute("""
+            SELECT date, total_occupations, avg_duration, total_minutes,
+                   access_types, no_shows
+            FROM daily_rollup
+            WHERE date >= ? AND date <= ?
+        """, (first_date, last_date))
+        return {
+            row['date']: {
+                'total_occupations': row['total_occupations'],
+                'avg_duration': row['avg_duration'],
+                'total_minutes': row['total_minutes'],
+                'access_types': json.loads(row['access_types']),
+                'no_shows': row['no_shows']
+            }
+            for row in cursor.fetchall()
+        }
+    
+    def _store_daily_rollup(self, conn: sqlite3.Connection, stats: Dict[str, Dict]):
+        """Save per-day stats into daily_rollup (caller commits)"""
+        conn.executemany("""
+            INSERT OR REPLACE INTO daily_rollup
+            (date, total_occupations, avg_duration, total_minutes, access_types, no_shows)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [(date, day['total_occupations'], day['avg_duration'], day['total_minutes'],
+               json.dumps(day['access_types']), day['no_shows'])
+              for date, day in stats.items()])
+    
+    def _compute_daily_stats(self, conn: sqlite3.Connection,
+                             dates: List[str]) -> Dict[str, Dict]:
+        """Compute per-day stats from the raw tables with one range scan each"""
+        range_start = min(dates)
+        range_end = (datetime.strptime(max(dates), '%Y-%m-%d') + timedelta(days=1)).strftime('%Y-%m-%d')
+        
+        # Per-day accumulators: [occupations, durations counted, total minutes]
+        totals = {date: [0, 0, None] for date in dates}
+        access_types = {date: {} for date in dates}
+        no_shows = {date: 0 for date in dates}
+        
+        cursor = conn.execute("""
+            SELECT DATE(start_time) as day, access_type,
+                   COUNT(*) as count,
+                   COUNT(duration_minutes) as duration_count,
+                   SUM(duration_minutes) as total_minutes
+            FROM occupancy_stats
+            WHERE start_time >= ? AND start_time < ?
+            GROUP BY day, access_type
+        """, (range_start, range_end))
+        for row in cursor.fetchall():
+            day_totals = totals.get(row['day'])
+            if day_totals is None:
+                continue
+            day_totals[0] += row['count']
+            day_totals[1] += row['duration_count']
+            if row['total_minutes'] is not None:
+                day_totals[2] = (day_totals[2] or 0) + row['total_minutes']
+            access_types[row['day']][row['access_type']] = row['count']
+        
+        cursor = conn.execute("""
+            SELECT DATE(timestamp) as day, COUNT(*) as no_shows
+            FROM events
+            WHERE timestamp >= ? AND timestamp < ? AND no_show = 1
+            GROUP BY day
+        """, (range_start, range_end))
+        for row in cursor.fetchall():
+            if row['day'] in no_shows:
+                no_shows[row['day']] = row['no_shows']
+        
+        stats = {}
+        for date in dates:
+            occupations, duration_count, total_minutes = totals[date]
+            stats[date] = {
+                'total_occupations': occupations,
+                'avg_duration': total_minutes / duration_count if duration_count else None,
+                'total_minutes': total_minutes,
+                'access_types': access_types[date],
+                'no_shows': no_shows[date]
+            }
         
         return stats
     
     def get_peak_hours(self, days: int = 7) -> List[Dict]:
         """Get peak usage hours"""
-        with self.get_connection() as conn:
-            cursor = conn.execute("""
+        with self.read_connection() as conn:
+            cursor = self._tuple_cursor(conn)
+            cursor.execute("""
                 SELECT strftime('%H', start_time) as hour,
                        COUNT(*) as occupations
                 FROM occupancy_stats
-                WHERE start_time >= datetime('now', '-{} days')
+                WHERE start_time >= datetime('now', ?)
                 GROUP BY strftime('%H', start_time)
                 ORDER BY occupations DESC
-            """.format(days))
-            return [dict(row) for row in cursor.fetchall()]
+            """, (f'-{int(days)} days',))
+            return [{'hour': hour, 'occupations': occupations} for hour, occupations in cursor]
     
     # Configuration management
     def get_config(self, key: str) -> Optional[str]:
@@ -657,15 +1176,16 @@ class DatabaseManager:
         with self.get_connection() as conn:
             conn.execute("""
                 INSERT OR REPLACE INTO config (key, value, description, updated_at)
-                VALUES (?, ?, ?, ?)
-            """, (key, value, description, datetime.now().isoformat()))
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            """, (key, value, description))
             conn.commit()
     
     def get_all_config(self) -> Dict[str, str]:
         """Get all configuration values"""
         with self.get_connection() as conn:
-            cursor = conn.execute("SELECT key, value FROM config")
-            return {row['key']: row['value'] for row in cursor.fetchall()}
+            cursor = self._tuple_cursor(conn)
+            cursor.execute("SELECT key, value FROM config")
+            return dict(cursor)
     
     # System maintenance
     def cleanup_old_data(self, days: int = 30):
@@ -673,25 +1193,73 @@ class DatabaseManager:
         cutoff_date = (datetime.now() - timedelta(days=days)).isoformat()
         
         with self.get_connection() as conn:
+            # Roll up the days whose events are about to be purged
+            row = conn.execute(
+                "SELECT MIN(timestamp) FROM events WHERE timestamp < ?", (cutoff_date,)
+            ).fetchone()
+            if row[0]:
+                first_day = datetime.strptime(row[0][:10], '%Y-%m-%d')
+                today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+                last_day = min(datetime.strptime(cutoff_date[:10], '%Y-%m-%d'), today - timedelta(days=1))
+                dates = [(first_day + timedelta(days=i)).strftime('%Y-%m-%d')
+                         for i in range((last_day - first_day).days + 1)]
+                if dates:
+                    stored = self._read_daily_rollup(conn, dates[0], dates[-1])
+                    dates = [date for date in dates if date not in stored]
+                if dates:
+                    self._store_daily_rollup(conn, self._compute_daily_stats(conn, dates))
+                    conn.commit()
+            
             # Clean old completed/no-show queue entries
-            conn.execute("""
-                DELETE FROM queue 
-                WHERE timestamp < ? AND status IN ('completed', 'no_show')
-            """, (cutoff_date,))
+            self._delete_in_chunks(conn, "queue",
+                                   "timestamp < ? AND status IN ('completed', 'no_show')",
+                                   (cutoff_date,))
             
             # Clean old events (keep occupancy stats longer)
-            conn.execute("""
-                DELETE FROM events 
-                WHERE timestamp < ?
-            """, (cutoff_date,))
+            self._delete_in_chunks(conn, "events", "timestamp < ?", (cutoff_date,))
             
             # Clean old login attempts
-            conn.execute("""
-                DELETE FROM login_attempts 
-                WHERE attempt_time < ?
-            """, (cutoff_date,))
+            self._delete_in_chunks(conn, "login_attempts", "attempt_time < ?", (cutoff_date,))
             
+            # Fold the WAL back into the database and truncate it
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+            
+            # Table sizes changed, refresh planner statistics
+            conn.execute("ANALYZE")
+    
+    def _delete_in_chunks(self, conn: sqlite3.Connection, table: str,
+                          where: str, params: tuple) -> int:
+        """Delete matching rows CLEANUP_CHUNK_SIZE at a time, committing each chunk
+        
+        Short transactions keep the write lock and WAL growth bounded.
+        """
+        sql = f"""
+            DELETE FROM {table}
+            WHERE rowid IN (SELECT rowid FROM {table} WHERE {where} LIMIT ?)
+        """
+        deleted = 0
+        while True:
+            cursor = conn.execute(sql, params + (self.CLEANUP_CHUNK_SIZE,))
             conn.commit()
+            deleted += cursor.rowcount
+            if cursor.rowcount < self.CLEANUP_CHUNK_SIZE:
+                return deleted
+    
+    def analyze(self):
+        """Refresh SQLite planner statistics (sqlite_stat1)"""
+        try:
+            with self.get_connection() as conn:
+                conn.execute("ANALYZE")
+        except sqlite3.Error as e:
+            self.logger.warning(f"ANALYZE failed: {e}")
+    
+    def optimize(self):
+        """Run PRAGMA optimize (re-analyzes only tables whose stats drifted)"""
+        try:
+            with self.get_connection() as conn:
+                conn.execute("PRAGMA optimize")
+        except sqlite3.Error as e:
+            self.logger.warning(f"PRAGMA optimize failed: {e}")
     
     def backup_database(self, backup_path: str = None) -> str:
         """Create database backup"""
@@ -702,12 +1270,21 @@ class DatabaseManager:
         os.makedirs(os.path.dirname(backup_path), exist_ok=True)
         
         with self.get_connection() as conn:
-            backup_conn = sqlite3.connect(backup_path)
-            conn.backup(backup_conn)
-            backup_conn.close()
+            # Autocommit so the target doesn't hold a transaction open
+            backup_conn = sqlite3.connect(backup_path, isolation_level=None)
+            try:
+                # Copy in slices so other connections can run in between
+                conn.backup(backup_conn, pages=self.BACKUP_PAGES_PER_STEP,
+                            progress=self._backup_progress, sleep=0.05)
+            finally:
+                backup_conn.close()
         
         return backup_path
     
+    def _backup_progress(self, status: int, remaining: int, total: int):
+        """Progress callback for backup_database"""
+        self.logger.debug(f"Backup progress: {total - remaining}/{total} pages")
+    
     def get_system_info(self) -> Dict:
         """Get system information"""
         with self.get_connection() as conn:
@@ -718,20 +1295,21 @@ class DatabaseManager:
             
             # Record counts
             for table in ['users', 'queue', 'occupancy_stats', 'events']:
-                cursor = conn.execute(f"SELECT COUNT(*) as count FROM {table}")
-                info[f'{table}_count'] = cursor.fetchone()['count']
+                cursor = conn.execute(f"SELECT COUNT(*) FROM {table}")
+                info[f'{table}_count'] = cursor.fetchone()[0]
             
             # Current queue size
-            cursor = conn.execute("SELECT COUNT(*) as count FROM queue WHERE status = 'waiting'")
-            info['current_queue_size'] = cursor.fetchone()['count']
+            cursor = conn.execute("SELECT COUNT(*) FROM queue WHERE status = 'waiting'")
+            info['current_queue_size'] = cursor.fetchone()[0]
             
             # Today's activity
-            today = datetime.now().strftime('%Y-%m-%d')
+            # Range on start_time (not DATE(start_time)) so the index applies
+            today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
             cursor = conn.execute("""
-                SELECT COUNT(*) as count FROM occupancy_stats 
-                WHERE DATE(start_time) = ?
-            """, (today,))
-            info['today_occupations'] = cursor.fetchone()['count']
+                SELECT COUNT(*) FROM occupancy_stats 
+                WHERE start_time >= ? AND start_time < ?
+            """, (today.strftime('%Y-%m-%d'), (today + timedelta(days=1)).strftime('%Y-%m-%d')))
+            info['today_occupations'] = cursor.fetchone()[0]
             
             return info
 
@@ -767,39 +1345,17 @@ class DatabaseManager:
     
     def init_default_config(self):
         """Initialize default configuration values"""
-        from config.config import Config
-        
-        default_configs = [
-            ('reservation_timeout_minutes', Config.RESERVATION_TIMEOUT_MINUTES, 'Timeout prenotazione in minuti'),
-            ('max_occupancy_minutes', Config.MAX_OCCUPANCY_MINUTES, 'Durata massima occupazione in minuti'),
-            ('max_queue_size', Config.MAX_QUEUE_SIZE, 'Dimensione massima della coda'),
-            ('movement_timeout_minutes', Config.MOVEMENT_TIMEOUT_MINUTES, 'Timeout movimento in minuti'),
-            ('auto_reset_time', Config.AUTO_RESET_TIME, 'Orario reset automatico'),
-            ('conflict_priority', Config.CONFLICT_PRIORITY, 'Priorità in caso di conflitto'),
-            ('use_pir_sensor', Config.USE_PIR_SENSOR, 'Usa sensore PIR'),
-            ('use_ultrasonic_sensor', Config.USE_ULTRASONIC_SENSOR, 'Usa sensore ultrasonico'),
-            ('presence_threshold_cm', Config.PRESENCE_THRESHOLD_CM, 'Soglia presenza in cm'),
-            ('dual_sensor_mode', Config.DUAL_SENSOR_MODE, 'Modalità sensori multipli'),
-            ('pir_absence_seconds', Config.PIR_ABSENCE_SECONDS, 'Secondi assenza PIR'),
-            ('ultrasonic_polling_seconds', Config.ULTRASONIC_POLLING_SECONDS, 'Frequenza polling ultrasonico'),
-            ('pushover_enabled', Config.PUSHOVER_ENABLED, 'Abilita notifiche Pushover'),
-            ('pushover_user_key', Config.PUSHOVER_USER_KEY, 'Chiave utente Pushover'),
-            ('pushover_api_token', Config.PUSHOVER_API_TOKEN, 'Token API Pushover'),
-            ('session_timeout_minutes', Config.SESSION_TIMEOUT_MINUTES, 'Timeout sessione admin'),
-            ('max_login_attempts', Config.MAX_LOGIN_ATTEMPTS, 'Tentativi massimi login'),
-            ('lockout_duration_minutes', Config.LOCKOUT_DURATION_MINUTES, 'Durata blocco login'),
-        ]
+        # Values are read on each call: the admin reset endpoint reassigns Config attributes
+        default_configs = [(key, str(getattr(Config, key.upper())), description)
+                           for key, description in self.DEFAULT_CONFIG_DESCRIPTIONS]
         
         try:
             with self.get_connection() as conn:
-                for key, value, description in default_configs:
-                    # Solo se non esiste già
-                    cursor = conn.execute("SELECT COUNT(*) as count FROM config WHERE key = ?", (key,))
-                    if cursor.fetchone()['count'] == 0:
-                        conn.execute("""
-                            INSERT INTO config (key, value, description)
-                            VALUES (?, ?, ?)
-                        """, (key, str(value), description))
+                # Solo se non esiste già (key is the primary key)
+                conn.executemany("""
+                    INSERT OR IGNORE INTO config (key, value, description)
+                    VALUES (?, ?, ?)
+                """, default_configs)
                 conn.commit()
                 self.logger.info("Default configuration initialized")
                 return True
@@ -812,10 +1368,11 @@ class DatabaseManager:
         Ottiene gli eventi recenti dal database per la dashboard admin
         """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
+            with self.get_connection() as conn:
+                # Timestamp già formattato per la dashboard da SQLite
                 cursor = conn.execute("""
-                    SELECT timestamp, event_type, details 
+                    SELECT strftime('%d/%m %H:%M', timestamp) as formatted_time,
+                           event_type, details 
                     FROM events 
                     ORDER BY timestamp DESC 
                     LIMIT ?
@@ -823,9 +1380,7 @@ class DatabaseManager:
                 
                 events = []
                 for row in cursor.fetchall():
-                    # Formatta il timestamp per la dashboard
-                    dt = datetime.strptime(row['timestamp'], '%Y-%m-%d %H:%M:%S')
-                    formatted_time = dt.strftime('%d/%m %H:%M')
+                    formatted_time = row['formatted_time']
                     
                     # Crea descrizione user-friendly
                     description = self._format_event_description(row['event_type'], row['details'])
@@ -846,80 +1401,44 @@ class DatabaseManager:
         """
         Formatta la descrizione dell'evento per la dashboard
         """
-        if event_type == 'BOOKING_CREATED':
-            return f"Prenotazione creata - {details}"
-        elif event_type == 'BOOKING_ACTIVATED':
-            return f"Turno attivato - {details}"
-        elif event_type == 'BOOKING_CANCELLED':
-            return f"Prenotazione cancellata - {details}"
-        elif event_type == 'OFFICE_OCCUPIED':
-            return f"Ufficio occupato - {details}"
-        elif event_type == 'OFFICE_FREE':
-            return f"Ufficio liberato - {details}"
-        elif event_type == 'NO_SHOW':
-            return f"No-show rilevato - {details}"
-        elif event_type == 'CONFIG_CHANGED':
-            return f"Configurazione modificata - {details}"
-        elif event_type == 'QUEUE_POSITION_CHANGED':
-            return f"Posizione in coda cambiata - {details}"
-        elif event_type == 'QUEUE_CLEARED':
-            return f"Coda svuotata - {details}"
-        elif event_type == 'SYSTEM_RESET':
-            return f"Sistema resettato - {details}"
-        elif event_type == 'USER_ENTERED_OFFICE':
-            return f"Utente entrato in ufficio - {details}"
-        elif event_type == 'USER_LEFT_OFFICE':
-            return f"Utente uscito dall'ufficio - {details}"
-        elif event_type == 'SYSTEM_RECOVERY':
-            return f"Sistema ripristinato dopo riavvio - {details}"
-        elif event_type == 'NO_SHOW_CLEANUP':
-            return f"Pulizia no-show al riavvio - {details}"
-        elif event_type == 'RESERVATION_EXPIRED':
-            return f"Prenotazione scaduta - {details}"
-        else:
+        label = self.EVENT_LABELS.get(event_type)
+        if label is None:
             return details or event_type
+        return f"{label} - {details}"
     
     def get_system_recovery_stats(self):
         """Get statistics about system recoveries and restarts"""
         try:
             with self.get_connection() as conn:
-                # Count recoveries in last 30 days
-                cursor = conn.execute("""
-                    SELECT COUNT(*) as recovery_count
-                    FROM events
-                    WHERE event_type = 'SYSTEM_RECOVERY'
-                    AND timestamp >= datetime('now', '-30 days')
-                """)
-                recovery_stats = dict(cursor.fetchone())
-                
-                # Get last recovery time
-                cursor = conn.execute("""
-                    SELECT timestamp, details
-                    FROM events
-                    WHERE event_type = 'SYSTEM_RECOVERY'
-                    ORDER BY timestamp DESC
-                    LIMIT 1
-                """)
-                last_recovery = cursor.fetchone()
-                
-                if last_recovery:
-                    recovery_stats['last_recovery_time'] = last_recovery['timestamp']
-                    recovery_stats['last_recovery_details'] = last_recovery['details']
-                else:
-                    recovery_stats['last_recovery_time'] = None
-                    recovery_stats['last_recovery_details'] = None
-                
-                # Count no-shows from recovery cleanup
-                cursor = conn.execute("""
-                    SELECT COUNT(*) as cleanup_no_shows
-                    FROM events
-                    WHERE event_type IN ('NO_SHOW_CLEANUP', 'RESERVATION_EXPIRED')
-                    AND timestamp >= datetime('now', '-30 days')
+                # Recoveries and recovery cleanups in the last 30 days plus
+                # the latest recovery, in one statement
+                cursor = self._tuple_cursor(conn)
+                cursor.execute("""
+                    SELECT
+                        (SELECT COUNT(*) FROM events
+                         WHERE event_type = 'SYSTEM_RECOVERY'
+                         AND timestamp >= datetime('now', '-30 days')) as recovery_count,
+                        last.timestamp as last_recovery_time,
+                        last.details as last_recovery_details,
+                        (SELECT COUNT(*) FROM events
+                         WHERE event_type IN ('NO_SHOW_CLEANUP', 'RESERVATION_EXPIRED')
+                         AND timestamp >= datetime('now', '-30 days')) as cleanup_no_shows
+                    FROM (SELECT 1)
+                    LEFT JOIN (
+                        SELECT timestamp, details FROM events
+                        WHERE event_type = 'SYSTEM_RECOVERY'
+                        ORDER BY timestamp DESC
+                        LIMIT 1
+                    ) last
                 """)
-                cleanup_stats = dict(cursor.fetchone())
-                recovery_stats.update(cleanup_stats)
+                recovery_count, last_time, last_details, cleanup_no_shows = cursor.fetchone()
                 
-                return recovery_stats
+                return {
+                    'recovery_count': recovery_count,
+                    'last_recovery_time': last_time,
+                    'last_recovery_details': last_details,
+                    'cleanup_no_shows': cleanup_no_shows
+                }
                 
         except Exception as e:
             self.logger.error(f"Error getting recovery stats: {e}")
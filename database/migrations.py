@@ -52,6 +52,27 @@ class MigrationManager:
             description="User management enhancements",
             up_func=self._migration_003_user_enhancements
         ))
+        
+        # Migration 4: Index events by type and time
+        self.migrations.append(Migration(
+            version=4,
+            description="Add events type/timestamp index",
+            up_func=self._migration_004_events_type_index
+        ))
+        
+        # Migration 5: Index events by time for recent-events lookups
+        self.migrations.append(Migration(
+            version=5,
+            description="Add events timestamp index",
+            up_func=self._migration_005_events_timestamp_index
+        ))
+        
+        # Migration 6: Store config by key only
+        self.migrations.append(Migration(
+            version=6,
+            description="Rebuild config as WITHOUT ROWID",
+            up_func=self._migration_006_config_without_rowid
+        ))
     
     def _ensure_migrations_table(self, conn: sqlite3.Connection):
         """Ensure migrations table exists"""
@@ -64,17 +85,32 @@ class MigrationManager:
         """)
     
     def get_current_version(self) -> int:
-        """Get current database version"""
+        """Get current database version
+        
+        Read from PRAGMA user_version (kept in the database header); the
+        migrations table is only history.
+        """
         try:
             with sqlite3.connect(self.db_path) as conn:
-                self._ensure_migrations_table(conn)
-                cursor = conn.execute("SELECT MAX(version) as version FROM migrations")
-                row = cursor.fetchone()
-                return row[0] if row[0] is not None else 0
+                version = conn.execute("PRAGMA user_version").fetchone()[0]
+                if version == 0:
+                    # Databases migrated before user_version was maintained
+                    version = self._get_table_version(conn)
+                return version
         except Exception as e:
             self.logger.error(f"Error getting current version: {e}")
             return 0
     
+    def _get_table_version(self, conn: sqlite3.Connection) -> int:
+        """Get highest version recorded in the migrations table, if any"""
+        cursor = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'migrations'"
+        )
+        if not cursor.fetchone():
+            return 0
+        row = conn.execute("SELECT MAX(version) FROM migrations").fetchone()
+        return row[0] if row[0] is not None else 0
+    
     def apply_migrations(self) -> bool:
         """Apply all pending migrations"""
         try:
@@ -100,6 +136,8 @@ class MigrationManager:
                             "INSERT INTO migrations (version, description) VALUES (?, ?)",
                             (migration.version, migration.description)
                         )
+                        # Committed together with the migration
+                        conn.execute(f"PRAGMA user_version = {int(migration.version)}")
                         
                         conn.commit()
                         self.logger.info(f"Migration {migration.version} applied successfully")
@@ -130,23 +168,68 @@ class MigrationManager:
             "CREATE INDEX IF NOT EXISTS idx_events_date ON events(DATE(timestamp))",
         ]
         
-        for index_sql in indexes:
-            conn.execute(index_sql)
+        # One script; BEGIN keeps it in the transaction apply_migrations commits
+        conn.executescript("BEGIN;\n" + ";\n".join(indexes) + ";")
     
     def _migration_003_user_enhancements(self, conn: sqlite3.Connection):
         """Migration 3: User management enhancements"""
-        # Add email and active status to users table
-        try:
-            conn.execute("ALTER TABLE users ADD COLUMN email TEXT")
-        except sqlite3.OperationalError:
-            pass  # Column already exists
+        # Add email and active status to users table (skip existing columns)
+        existing = {row[1] for row in conn.execute("PRAGMA table_info(users)")}
+        columns = [
+            ('email', 'TEXT'),
+            ('active', 'BOOLEAN DEFAULT TRUE'),
+            ('last_used', 'DATETIME'),
+        ]
+        alters = [f"ALTER TABLE users ADD COLUMN {name} {definition};"
+                  for name, definition in columns if name not in existing]
         
-        try:
-            conn.execute("ALTER TABLE users ADD COLUMN active BOOLEAN DEFAULT TRUE")
-        except sqlite3.OperationalError:
-            pass  # Column already exists
+        if alters:
+            # BEGIN keeps the script in the transaction apply_migrations commits
+            conn.executescript("BEGIN;\n" + "\n".join(alters))
+    
+    def _migration_004_events_type_index(self, conn: sqlite3.Connection):
+        """Migration 4: Events type/timestamp index
         
-        try:
-            conn.execute("ALTER TABLE users ADD COLUMN last_used DATETIME")
-        except sqlite3.OperationalError:
-            pass  # Column already exists
+        Serves the event_type + timestamp range and latest-by-type lookups
+        (ORDER BY timestamp DESC LIMIT 1 walks the index backwards), which
+        the DATE(timestamp) expression index can't. Same definition as in
+        db_manager's schema, so databases created there are unaffected.
+        """
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_events_type_ts ON events(event_type, timestamp)")
+        conn.execute("ANALYZE events")
+    
+    def _migration_005_events_timestamp_index(self, conn: sqlite3.Connection):
+        """Migration 5: Events timestamp index
+        
+        Lets ORDER BY timestamp DESC LIMIT ? (recent events) walk the index
+        backwards and stop after LIMIT rows instead of sorting the table.
+        """
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events(timestamp)")
+    
+    def _migration_006_config_without_rowid(self, conn: sqlite3.Connection):
+        """Migration 6: Rebuild config as a WITHOUT ROWID table
+        
+        config is only ever looked up by key, so keeping the rows in the
+        primary key b-tree saves the extra rowid b-tree lookup. events
+        already uses id INTEGER PRIMARY KEY, which is the rowid.
+        """
+        row = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'config'"
+        ).fetchone()
+        if not row or 'WITHOUT ROWID' in row[0].upper():
+            return
+        
+        # BEGIN keeps the rebuild in the transaction apply_migrations commits
+        conn.executescript("""
+            BEGIN;
+            CREATE TABLE config_new (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                description TEXT,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            ) WITHOUT ROWID;
+            INSERT INTO config_new (key, value, description, updated_at)
+                SELECT key, value, description, updated_at FROM config;
+            DROP TABLE config;
+            ALTER TABLE config_new RENAME TO config;
+        """)
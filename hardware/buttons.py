@@ -4,10 +4,12 @@ Handles 2 tactile buttons with debouncing
 """
 
 import time
+import bisect
 import threading
 from datetime import datetime, timedelta
 from typing import Dict, Optional
 import logging
+from collections import deque
 
 try:
     import RPi.GPIO as GPIO
@@ -30,11 +32,12 @@ class ButtonController:
             1: Config.GPIO.BUTTON_1,  # Primary button
             2: Config.GPIO.BUTTON_2   # Secondary button
         }
+        self._channel_to_button = {pin: button_id for button_id, pin in self.button_pins.items()}
         
-        # Button states
+        # Button states (press times are time.monotonic() values)
         self.button_states = {1: False, 2: False}
         self.last_press_time = {1: None, 2: None}
-        self.press_events = {1: [], 2: []}
+        self.press_events = {1: deque(maxlen=10), 2: deque(maxlen=10)}  # Last 10 presses
         
         # Debouncing
         self.debounce_time = 0.05  # 50ms debounce
@@ -42,6 +45,12 @@ class ButtonController:
         
         # Event detection
         self.button_pressed_flags = {1: False, 2: False}
+        self._press_event = threading.Event()  # Wakes wait_for_button_press
+        
+        # Raw (button_id, time) presses from the GPIO thread, applied to the
+        # state above by _drain_presses. deque.append is atomic, so the
+        # interrupt callback never waits on button_lock.
+        self._pending_presses = deque()
         
         self.initialized = False
         
@@ -67,44 +76,52 @@ class ButtonController:
             raise RuntimeError("GPIO not available")
         
         # Setup button pins as inputs with pull-up resistors
-        for button_id, pin in self.button_pins.items():
+        for pin in self.button_pins.values():
             GPIO.setup(pin, GPIO.IN, pull_up_down=GPIO.PUD_UP)
             
             # Add event detection for button press (falling edge due to pull-up)
             GPIO.add_event_detect(
                 pin, 
                 GPIO.FALLING,
-                callback=lambda channel, btn_id=button_id: self._button_callback(btn_id),
+                callback=self._gpio_callback,
                 bouncetime=int(self.debounce_time * 1000)  # Convert to milliseconds
             )
         
         self.logger.info("Button GPIO pins configured with interrupts")
     
+    def _gpio_callback(self, channel: int):
+        """GPIO interrupt callback, maps the pin back to its button"""
+        self._button_callback(self._channel_to_button[channel])
+    
     def _button_callback(self, button_id: int):
-        """GPIO interrupt callback for button press"""
-        with self.button_lock:
-            now = datetime.now()
+        """GPIO interrupt callback for button press (only queues it)"""
+        self._pending_presses.append((button_id, time.monotonic()))
+        self._press_event.set()
+    
+    def _drain_presses(self):
+        """Apply queued presses to the button state (call with button_lock held)"""
+        while self._pending_presses:
+            button_id, now = self._pending_presses.popleft()
             
             # Additional software debouncing
-            if self.last_press_time[button_id]:
-                time_since_last = now - self.last_press_time[button_id]
-                if time_since_last.total_seconds() < self.debounce_time:
-                    return  # Ignore - too soon after last press
+            last_press = self.last_press_time[button_id]
+            if last_press is not None and now - last_press < self.debounce_time:
+                continue  # Ignore - too soon after last press
             
             # Record button press
             self.last_press_time[button_id] = now
             self.button_pressed_flags[button_id] = True
             
-            # Add to event list (keep last 10 events)
+            # Add to event list (deque keeps the last 10 events)
             self.press_events[button_id].append(now)
-            if len(self.press_events[button_id]) > 10:
-                self.press_events[button_id].pop(0)
             
             self.logger.info(f"Button {button_id} pressed")
     
     def button_pressed(self, button_id: Optional[int] = None) -> bool:
         """Check if button was pressed (consume event)"""
         with self.button_lock:
+            self._drain_presses()
+            
             if button_id is None:
                 # Check any button
                 any_pressed = any(self.button_pressed_flags.values())
@@ -144,14 +161,23 @@ class ButtonController:
             states[button_id] = self.is_button_currently_pressed(button_id)
         return states
     
+    @staticmethod
+    def _to_datetime(press_time: float) -> datetime:
+        """Convert a time.monotonic() press time to wall-clock time"""
+        return datetime.now() - timedelta(seconds=time.monotonic() - press_time)
+    
     def get_last_press_time(self, button_id: int) -> Optional[datetime]:
         """Get time of last button press"""
-        return self.last_press_time.get(button_id)
+        with self.button_lock:
+            self._drain_presses()
+            last_press = self.last_press_time.get(button_id)
+        return self._to_datetime(last_press) if last_press is not None else None
     
     def get_press_history(self, button_id: int) -> list:
         """Get recent press history for button"""
         with self.button_lock:
-            return self.press_events[button_id].copy()
+            self._drain_presses()
+            return [self._to_datetime(press_time) for press_time in self.press_events[button_id]]
     
     def simulate_button_press(self, button_id: Optional[int] = None) -> bool:
         """Simulate button press for testing"""
@@ -166,16 +192,18 @@ class ButtonController:
             return False
         
         with self.button_lock:
+            # Apply earlier hardware presses first to keep the history ordered
+            self._drain_presses()
+            
             # Simulate press event
-            now = datetime.now()
+            now = time.monotonic()
             self.last_press_time[target_button] = now
             self.button_pressed_flags[target_button] = True
             
             # Add to event list
             self.press_events[target_button].append(now)
-            if len(self.press_events[target_button]) > 10:
-                self.press_events[target_button].pop(0)
             
+            self._press_event.set()
             self.logger.info(f"[SIMULATION] Button {target_button} pressed")
             return True
     
@@ -201,23 +229,30 @@ class ButtonController:
     
     def wait_for_button_press(self, timeout: Optional[float] = None) -> Optional[int]:
         """Wait for any button press and return which button"""
-        start_time = time.time()
+        deadline = time.monotonic() + timeout if timeout else None
         
         while True:
+            # Clear before checking so a press landing after the check
+            # still wakes the wait below
+            self._press_event.clear()
+            
             # Check all buttons
             for button_id in self.button_pins:
                 if self.button_pressed(button_id):
                     return button_id
             
             # Check timeout
-            if timeout and (time.time() - start_time) > timeout:
+            remaining = deadline - time.monotonic() if deadline else None
+            if remaining is not None and remaining <= 0:
                 return None
             
-            time.sleep(0.01)  # 10ms polling
+            # Sleep until a press is recorded (or the timeout expires)
+            self._press_event.wait(remaining)
     
     def clear_all_events(self):
         """Clear all pending button events"""
         with self.button_lock:
+            self._drain_presses()
             for button_id in self.button_pressed_flags:
                 self.button_pressed_flags[button_id] = False
             self.logger.info("All button events cleared")
@@ -227,19 +262,21 @@ class ButtonController:
         stats = {}
         
         with self.button_lock:
+            self._drain_presses()
             for button_id in self.button_pins:
                 last_press = self.last_press_time[button_id]
                 press_count = len(self.press_events[button_id])
                 
-                # Calculate press frequency (last minute)
+                # Calculate press frequency (last minute); monotonic press
+                # times are always in ascending order
                 recent_presses = 0
                 if press_count > 0:
-                    one_minute_ago = datetime.now() - timedelta(minutes=1)
-                    recent_presses = sum(1 for press_time in self.press_events[button_id] 
-                                       if press_time > one_minute_ago)
+                    one_minute_ago = time.monotonic() - 60
+                    recent_presses = press_count - bisect.bisect_right(
+                        self.press_events[button_id], one_minute_ago)
                 
                 stats[button_id] = {
-                    'last_press': last_press.isoformat() if last_press else None,
+                    'last_press': self._to_datetime(last_press).isoformat() if last_press is not None else None,
                     'total_presses': press_count,
                     'recent_presses_per_minute': recent_presses,
                     'currently_pressed': self.is_button_currently_pressed(button_id)
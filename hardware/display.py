@@ -4,38 +4,90 @@ Handles OLED SSD1306 128x64 display
 """
 
 import time
+import queue
 import threading
-from datetime import datetime, timedelta
 from typing import Dict, Any
 import logging
+import importlib.util
+from collections import OrderedDict
+from contextlib import contextmanager, nullcontext
 
+# luma and PIL are only imported by _setup_hardware_display, so simulation
+# runs don't pay for them
 try:
-    from luma.core.interface.serial import i2c
-    from luma.core.render import canvas
-    from luma.oled.device import ssd1306
-    DISPLAY_AVAILABLE = True
+    DISPLAY_AVAILABLE = all(importlib.util.find_spec(name) for name in ('luma.oled', 'PIL'))
 except ImportError:
     DISPLAY_AVAILABLE = False
 
+from config.config import Config
+
+# SSD1306 addressing commands (horizontal addressing mode)
+SSD1306_COLUMNADDR = 0x21
+SSD1306_PAGEADDR = 0x22
+
+# Device-tree clock of the I2C bus the display is on (big-endian u32)
+I2C_CLOCK_FREQUENCY_PATH = "/sys/class/i2c-adapter/i2c-1/of_node/clock-frequency"
+
 class DisplayController:
     """Manages OLED display output"""
     
+    # Rendered status frames kept for reuse (a handful of screens repeat)
+    FRAME_CACHE_SIZE = 32
+    
+    # Pre-rendered pieces of the "Tempo: mm:ss" countdown line
+    TIMER_LABEL = "Tempo: "
+    TIMER_GLYPHS = TIMER_LABEL, *"0123456789:"
+    
+    # Fixed text of each status screen, rendered once into a base image;
+    # only the values are drawn per frame
+    SCREEN_TEMPLATES = {
+        'free': (((10, 5), "UFFICIO: LIBERO"),),
+        'occupied': (((5, 2), "UFFICIO: OCCUPATO"),),
+        'queue': (((10, 5), "CODA ATTIVA"), ((5, 35), "Prossimo:")),
+        'reserved': (((15, 5), "RISERVATO"), ((5, 50), "Premi per entrare")),
+        'warning': (((5, 2), "UFFICIO: OCCUPATO"), ((5, 16), "Ultimo movimento:"),
+                    ((5, 44), "Muoversi per"), ((5, 56), "confermare presenza")),
+        'error': (((20, 15), "ERRORE"), ((5, 50), "Contattare assistenza")),
+    }
+    
     def __init__(self, simulation_mode: bool = False):
         self.logger = logging.getLogger(__name__)
         self.simulation_mode = simulation_mode
         
         # Display device
         self.device = None
+        self._Image = None  # PIL modules, imported by _setup_hardware_display
+        self._ImageDraw = None
+        self._font = None  # Loaded once, shared by every frame
+        self._timer_glyphs = {}  # text -> (mask image, advance in pixels)
+        self._templates = {}  # SCREEN_TEMPLATES name -> base image
         self.initialized = False
         
         # Display state
         self.current_screen = 'init'
         self.temp_message = None
-        self.temp_message_end = None
+        self.temp_message_end = None  # time.monotonic() deadline
+        self._last_fingerprint = None  # Inputs of the frame currently shown
+        self._frame_cache = OrderedDict()  # fingerprint -> rendered PIL image
+        self._shown_pages = None  # Page bytes last sent to the panel (None = unknown)
         
-        # Threading for display updates
+        # Threading for display updates (serializes access to the device)
         self.display_lock = threading.Lock()
         
+        # Status screen for each system state
+        self._screen_handlers = {
+            'LIBERO': self._show_free_screen,
+            'OCCUPATO_DIRETTO': self._show_occupied_screen,
+            'OCCUPATO_PRENOTATO': self._show_occupied_screen,
+            'IN_CODA': self._show_queue_screen,
+            'RISERVATO_ATTESA': self._show_reserved_screen,
+            'WARNING_TIMEOUT': self._show_warning_screen,
+        }
+        
+        # Latest status waiting for the writer thread (older ones are dropped)
+        self._render_q = queue.Queue(maxsize=1)
+        self._writer = None
+        
         self.logger.info(f"DisplayController initialized (simulation: {simulation_mode})")
     
     def initialize(self) -> bool:
@@ -43,6 +95,10 @@ class DisplayController:
         try:
             if not self.simulation_mode and DISPLAY_AVAILABLE:
                 self._setup_hardware_display()
+                
+                # Frames are drawn and sent off the caller's thread
+                self._writer = threading.Thread(target=self._writer_loop, daemon=True)
+                self._writer.start()
             
             self.initialized = True
             
@@ -56,17 +112,29 @@ class DisplayController:
             self.logger.error(f"Failed to initialize display: {e}")
             return False
     
-    def _setup_hardware_display(self):
+    def _setup_hardware_display(self, bus_speed: int = Config.DISPLAY_I2C_BAUDRATE):
         """Setup hardware OLED display"""
         try:
+            from luma.core.interface.serial import i2c
+            from luma.oled.device import ssd1306
+            from PIL import Image, ImageDraw, ImageFont
+            self._Image = Image
+            self._ImageDraw = ImageDraw
+            
+            self._check_bus_speed(bus_speed)
+            
             # Create I2C interface
             serial = i2c(port=1, address=0x3C)
             
             # Create display device
             self.device = ssd1306(serial, width=128, height=64)
+            self._font = ImageFont.load_default()
+            self._timer_glyphs = self._render_timer_glyphs()
+            self._templates = self._render_templates()
             
             # Clear display
             self.device.clear()
+            self._shown_pages = None
             
             self.logger.info("Hardware OLED display configured")
             
@@ -74,9 +142,58 @@ class DisplayController:
             self.logger.error(f"Failed to setup hardware display: {e}")
             raise
     
+    def _check_bus_speed(self, bus_speed: int):
+        """Warn if the I2C bus runs slower than bus_speed (Hz)
+        
+        The clock is fixed at boot by dtparam=i2c_arm_baudrate in
+        /boot/config.txt; i2c-dev can't change it, so only check it here.
+        """
+        try:
+            with open(I2C_CLOCK_FREQUENCY_PATH, 'rb') as f:
+                actual = int.from_bytes(f.read(4), 'big')
+        except OSError:
+            self.logger.debug("I2C bus speed not available, skipping check")
+            return
+        
+        if actual < bus_speed:
+            self.logger.warning(
+                f"I2C bus at {actual} Hz, expected {bus_speed} Hz: "
+                f"set dtparam=i2c_arm_baudrate={bus_speed} in /boot/config.txt"
+            )
+        else:
+            self.logger.info(f"I2C bus at {actual} Hz")
+    
     def update_display(self, display_data: Dict[str, Any]):
         """Update display with current system status"""
-        with self.display_lock:
+        if self._writer is not None:
+            # Hand over to the writer thread; replaces a status not yet drawn
+            self._put_latest(dict(display_data))
+        else:
+            self._render_status(display_data)
+    
+    def _put_latest(self, item):
+        """Queue item for the writer thread, dropping any pending one"""
+        while True:
+            try:
+                self._render_q.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._render_q.get_nowait()
+                except queue.Empty:
+                    pass
+    
+    def _writer_loop(self):
+        """Background thread drawing queued statuses (None stops it)"""
+        while True:
+            display_data = self._render_q.get()
+            if display_data is None:
+                break
+            self._render_status(display_data)
+    
+    def _render_status(self, display_data: Dict[str, Any]):
+        """Draw the status screen for display_data"""
+        with self._device_lock():
             try:
                 # Check for temporary message
                 if self._is_temp_message_active():
@@ -84,25 +201,142 @@ class DisplayController:
                 
                 state = display_data.get('state', 'UNKNOWN')
                 
-                if state == 'LIBERO':
-                    self._show_free_screen(display_data)
-                elif state in ['OCCUPATO_DIRETTO', 'OCCUPATO_PRENOTATO']:
-                    self._show_occupied_screen(display_data)
-                elif state == 'IN_CODA':
-                    self._show_queue_screen(display_data)
-                elif state == 'RISERVATO_ATTESA':
-                    self._show_reserved_screen(display_data)
-                elif state == 'WARNING_TIMEOUT':
-                    self._show_warning_screen(display_data)
+                # Skip the redraw (and the I2C transfer) if nothing shown changed
+                fingerprint = self._fingerprint(state, display_data)
+                if fingerprint == self._last_fingerprint:
+                    return
+                
+                # Same values shown before: push the cached frame, no redraw
+                cached_frame = self._frame_cache.get(fingerprint)
+                if cached_frame is not None and self.device:
+                    self._frame_cache.move_to_end(fingerprint)
+                    self._flush(cached_frame)
                 else:
-                    self._show_error_screen(f"Stato: {state}")
+                    show_screen = self._screen_handlers.get(state)
+                    if show_screen:
+                        show_screen(display_data, fingerprint)
+                    else:
+                        self._show_error_screen(f"Stato: {state}", fingerprint)
                 
                 self.current_screen = state
+                self._last_fingerprint = fingerprint
                 
             except Exception as e:
                 self.logger.error(f"Error updating display: {e}")
     
-    def _show_free_screen(self, data: Dict[str, Any]):
+    def _device_lock(self):
+        """display_lock on hardware; simulation only logs, so no lock"""
+        return nullcontext() if self.simulation_mode else self.display_lock
+    
+    def _fingerprint(self, state: str, data: Dict[str, Any]) -> tuple:
+        """Values that determine what the status screens draw"""
+        return (
+            state,
+            data.get('queue_size', 0),
+            self._occupation_timer(data),  # Shown as mm:ss
+            data.get('next_user'),
+            data.get('reserved_for'),
+            data.get('timeout_remaining_seconds'),
+            data.get('movement_time_ago_minutes'),
+        )
+    
+    @staticmethod
+    def _occupation_timer(data: Dict[str, Any]) -> tuple:
+        """(mins, secs) the occupied screen shows for occupation_duration_minutes"""
+        occupation_duration = data.get('occupation_duration_minutes') or 0
+        mins = int(occupation_duration)
+        secs = int((occupation_duration - mins) * 60)
+        return mins, secs
+    
+    @contextmanager
+    def _canvas(self, frame_key: tuple = None, template: str = None):
+        """Draw a frame and send it to the device (like luma's canvas)
+        
+        With a template the frame starts from that screen's fixed text.
+        With a frame_key the rendered image is also kept in the frame cache.
+        """
+        if template in self._templates:
+            image = self._templates[template].copy()
+        else:
+            image = self._Image.new(self.device.mode, self.device.size)
+        draw = self._ImageDraw.Draw(image)
+        # Default font for every draw.text, instead of each new ImageDraw
+        # loading its own copy
+        draw.font = self._font
+        yield draw
+        
+        if frame_key is not None:
+            self._frame_cache[frame_key] = image
+            if len(self._frame_cache) > self.FRAME_CACHE_SIZE:
+                self._frame_cache.popitem(last=False)
+        
+        self._flush(image)
+    
+    def _render_templates(self) -> Dict[str, Any]:
+        """Rasterize the fixed text of every status screen once"""
+        templates = {}
+        for name, lines in self.SCREEN_TEMPLATES.items():
+            image = self._Image.new(self.device.mode, self.device.size)
+            draw = self._ImageDraw.Draw(image)
+            for xy, text in lines:
+                draw.text(xy, text, fill="white", font=self._font)
+            templates[name] = image
+        return templates
+    
+    def _render_timer_glyphs(self) -> Dict[str, tuple]:
+        """Rasterize the countdown label and digits once, as paste masks"""
+        glyphs = {}
+        for text in self.TIMER_GLYPHS:
+            advance = round(self._font.getlength(text))
+            height = self._font.getbbox(text)[3]
+            mask = self._Image.new('1', (max(advance, 1), max(height, 1)))
+            self._ImageDraw.Draw(mask).text((0, 0), text, fill="white", font=self._font)
+            glyphs[text] = (mask, advance)
+        return glyphs
+    
+    def _draw_timer(self, draw, xy: tuple, mins: int, secs: int):
+        """Draw "Tempo: mm:ss" by pasting pre-rendered glyphs"""
+        digits = f"{mins:02d}:{secs:02d}"
+        if not all(char in self._timer_glyphs for char in digits):
+            # e.g. a negative countdown: fall back to normal text rendering
+            draw.text(xy, self.TIMER_LABEL + digits, fill="white")
+            return
+        
+        x, y = xy
+        for text in (self.TIMER_LABEL, *digits):
+            mask, advance = self._timer_glyphs[text]
+            draw.bitmap((x, y), mask, fill="white")
+            x += advance
+    
+    def _flush(self, image):
+        """Send a frame to the panel, transferring only the pages that changed
+        
+        Each SSD1306 page is a 128-byte strip of 8 pixel rows (bit 0 = top
+        row). Rotating the image 270 degrees turns every column into one
+        row of 8 bytes, byte k holding page 7-k, so each page's data is a
+        stride-8 slice of the raw bytes.
+        """
+        image = self.device.preprocess(image)
+        raw = image.transpose(self._Image.ROTATE_270).tobytes()
+        pages = [raw[7 - page::8] for page in range(8)]
+        
+        if self._shown_pages is None:
+            dirty = list(range(8))
+        else:
+            dirty = [page for page in range(8) if pages[page] != self._shown_pages[page]]
+        
+        if dirty:
+            # Two I2C transactions per frame: all six window-setup bytes in
+            # one command() block write, then the pixel data in one data()
+            # write (luma sends it as a single i2c_rdwr message with smbus2)
+            first, last = dirty[0], dirty[-1]
+            self.device.command(SSD1306_COLUMNADDR, 0, self.device.width - 1,
+                                SSD1306_PAGEADDR, first, last)
+            self.device.data(list(b"".join(pages[first:last + 1])))
+        
+        self._shown_pages = pages
+    
+    def _show_free_screen(self, data: Dict[str, Any], frame_key: tuple = None):
         """Show free office screen"""
         queue_size = data.get('queue_size', 0)
         
@@ -113,9 +347,7 @@ class DisplayController:
         if not self.device:
             return
         
-        with canvas(self.device) as draw:
-            # Title
-            draw.text((10, 5), "UFFICIO: LIBERO", fill="white")
+        with self._canvas(frame_key, 'free') as draw:
             draw.text((10, 20), f"Coda: {queue_size} persone", fill="white")
             
             # Instructions
@@ -125,7 +357,7 @@ class DisplayController:
                 draw.text((10, 40), "Prenota online o", fill="white")
                 draw.text((10, 52), "premi per saltare", fill="white")
     
-    def _show_occupied_screen(self, data: Dict[str, Any]):
+    def _show_occupied_screen(self, data: Dict[str, Any], frame_key: tuple = None):
         """Show occupied office screen"""
         queue_size = data.get('queue_size', 0)
         occupation_duration = data.get('occupation_duration_minutes', 0)
@@ -139,25 +371,18 @@ class DisplayController:
         if not self.device:
             return
         
-        with canvas(self.device) as draw:
-            # Title
-            draw.text((5, 2), "UFFICIO: OCCUPATO", fill="white")
-            
+        with self._canvas(frame_key, 'occupied') as draw:
             # Duration
-            mins = int(occupation_duration)
-            secs = int((occupation_duration - mins) * 60)
-            draw.text((5, 16), f"Tempo: {mins:02d}:{secs:02d}", fill="white")
+            self._draw_timer(draw, (5, 16), *self._occupation_timer(data))
             
             # Queue info
             draw.text((5, 30), f"Coda: {queue_size} persone", fill="white")
             
             if next_user and queue_size > 0:
-                # Truncate long user codes
-                display_user = next_user[:12] if len(next_user) > 12 else next_user
                 draw.text((5, 44), "Prossimo:", fill="white")
-                draw.text((5, 56), display_user, fill="white")
+                draw.text((5, 56), f"{next_user:.12s}", fill="white")  # Truncate long user codes
     
-    def _show_queue_screen(self, data: Dict[str, Any]):
+    def _show_queue_screen(self, data: Dict[str, Any], frame_key: tuple = None):
         """Show queue active screen"""
         queue_size = data.get('queue_size', 0)
         next_user = data.get('next_user', 'N/A')
@@ -170,16 +395,11 @@ class DisplayController:
         if not self.device:
             return
         
-        with canvas(self.device) as draw:
-            draw.text((10, 5), "CODA ATTIVA", fill="white")
+        with self._canvas(frame_key, 'queue') as draw:
             draw.text((5, 20), f"{queue_size} in attesa", fill="white")
-            draw.text((5, 35), "Prossimo:", fill="white")
-            
-            # Truncate user code if too long
-            display_user = next_user[:12] if len(next_user) > 12 else next_user
-            draw.text((5, 48), display_user, fill="white")
+            draw.text((5, 48), f"{next_user:.12s}", fill="white")  # Truncate long user codes
     
-    def _show_reserved_screen(self, data: Dict[str, Any]):
+    def _show_reserved_screen(self, data: Dict[str, Any], frame_key: tuple = None):
         """Show reserved for user screen"""
         user_name = data.get('reserved_for', 'Utente')
         timeout_remaining = data.get('timeout_remaining_seconds', 180)
@@ -191,20 +411,16 @@ class DisplayController:
         if not self.device:
             return
         
-        with canvas(self.device) as draw:
-            draw.text((15, 5), "RISERVATO", fill="white")
-            
+        with self._canvas(frame_key, 'reserved') as draw:
             # User name (truncated)
-            display_user = user_name[:12] if len(user_name) > 12 else user_name
-            draw.text((5, 20), f"Per: {display_user}", fill="white")
+            draw.text((5, 20), f"Per: {user_name:.12s}", fill="white")
             
             # Countdown
             mins = timeout_remaining // 60
             secs = timeout_remaining % 60
-            draw.text((5, 35), f"Tempo: {mins:02d}:{secs:02d}", fill="white")
-            draw.text((5, 50), "Premi per entrare", fill="white")
+            self._draw_timer(draw, (5, 35), mins, secs)
     
-    def _show_warning_screen(self, data: Dict[str, Any]):
+    def _show_warning_screen(self, data: Dict[str, Any], frame_key: tuple = None):
         """Show timeout warning screen"""
         occupation_duration = data.get('occupation_duration_minutes', 0)
         movement_time_ago = data.get('movement_time_ago_minutes', 0)
@@ -216,14 +432,10 @@ class DisplayController:
         if not self.device:
             return
         
-        with canvas(self.device) as draw:
-            draw.text((5, 2), "UFFICIO: OCCUPATO", fill="white")
-            draw.text((5, 16), "Ultimo movimento:", fill="white")
+        with self._canvas(frame_key, 'warning') as draw:
             draw.text((5, 30), f"{movement_time_ago} minuti fa", fill="white")
-            draw.text((5, 44), "Muoversi per", fill="white")
-            draw.text((5, 56), "confermare presenza", fill="white")
     
-    def _show_error_screen(self, error_msg: str = "Errore sistema"):
+    def _show_error_screen(self, error_msg: str = "Errore sistema", frame_key: tuple = None):
         """Show error screen"""
         if self.simulation_mode:
             self.logger.info(f"[DISPLAY] ERRORE: {error_msg}")
@@ -232,16 +444,20 @@ class DisplayController:
         if not self.device:
             return
         
-        with canvas(self.device) as draw:
-            draw.text((20, 15), "ERRORE", fill="white")
-            draw.text((5, 35), error_msg[:18], fill="white")  # Truncate long messages
-            draw.text((5, 50), "Contattare assistenza", fill="white")
+        with self._canvas(frame_key, 'error') as draw:
+            draw.text((5, 35), f"{error_msg:.18s}", fill="white")  # Truncate long messages
     
     def show_message(self, message: str, duration: int = 3):
         """Show temporary message"""
-        with self.display_lock:
+        with self._device_lock():
+            if message == self.temp_message and self._is_temp_message_active():
+                # Already on screen: only extend it, no redraw
+                self.temp_message_end = time.monotonic() + duration
+                return
+            
             self.temp_message = message
-            self.temp_message_end = datetime.now() + timedelta(seconds=duration)
+            self.temp_message_end = time.monotonic() + duration
+            self._last_fingerprint = None  # Status screen must be redrawn afterwards
             
             if self.simulation_mode:
                 self.logger.info(f"[DISPLAY] TEMP MESSAGE: {message} ({duration}s)")
@@ -251,7 +467,7 @@ class DisplayController:
                 return
             
             # Clear and show message
-            with canvas(self.device) as draw:
+            with self._canvas() as draw:
                 # Center the message
                 lines = message.split('\n')
                 y_start = 32 - (len(lines) * 8)
@@ -276,10 +492,10 @@ class DisplayController:
     
     def _is_temp_message_active(self) -> bool:
         """Check if temporary message should still be shown"""
-        if not self.temp_message_end:
+        if self.temp_message_end is None:
             return False
         
-        if datetime.now() > self.temp_message_end:
+        if time.monotonic() > self.temp_message_end:
             self.temp_message = None
             self.temp_message_end = None
             return False
@@ -288,12 +504,17 @@ class DisplayController:
     
     def clear_display(self):
         """Clear the display"""
-        if self.simulation_mode:
-            self.logger.info("[DISPLAY] CLEARED")
-            return
-        
-        if self.device:
-            self.device.clear()
+        # Under the lock so the writer thread can't be mid-flush
+        with self._device_lock():
+            self._last_fingerprint = None
+            
+            if self.simulation_mode:
+                self.logger.info("[DISPLAY] CLEARED")
+                return
+            
+            if self.device:
+                self.device.clear()
+                self._shown_pages = None
     
     def test_display(self):
         """Test display functionality"""
@@ -311,7 +532,13 @@ class DisplayController:
     
     def cleanup(self):
         """Clean up display resources"""
+        if self._writer is not None:
+            self._put_latest(None)
+            self._writer.join(timeout=2)
+            self._writer = None
+        
         if self.device:
             self.device.clear()
+            self._shown_pages = None
         
         self.logger.info("Display cleanup complete")
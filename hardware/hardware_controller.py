@@ -5,6 +5,7 @@ Coordinates all hardware components
 
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from typing import Dict, Optional, Any
 import logging
@@ -48,7 +49,6 @@ class HardwareController:
         
         # Hardware state
         self.initialized = False
-        self.sensor_thread = None
         self.running = False
         
         self.logger.info(f"HardwareController initialized (simulation_mode: {self.simulation_mode})")
@@ -76,12 +76,11 @@ class HardwareController:
                 self.logger.error("Failed to initialize buttons")
                 return False
             
+            # Sensors read themselves on their own thread; the app polls
+            # read_sensors() from its periodic check
             self.initialized = True
             self.running = True
             
-            # Start sensor monitoring thread
-            self._start_sensor_monitoring()
-            
             # Show initialization complete
             self.display.show_message("Sistema pronto", duration=2)
             
@@ -99,22 +98,6 @@ class HardwareController:
             GPIO.setwarnings(False)
             self.logger.info("GPIO initialized")
     
-    def _start_sensor_monitoring(self):
-        """Start background sensor monitoring"""
-        self.sensor_thread = threading.Thread(target=self._sensor_monitor_loop, daemon=True)
-        self.sensor_thread.start()
-        self.logger.info("Sensor monitoring thread started")
-    
-    def _sensor_monitor_loop(self):
-        """Background thread for sensor monitoring"""
-        while self.running:
-            try:
-                # Sensors read themselves in their own loop
-                time.sleep(0.1)  # 100ms polling interval
-            except Exception as e:
-                self.logger.error(f"Error in sensor monitor loop: {e}")
-                time.sleep(1)
-    
     # Sensor methods
     def read_sensors(self) -> Dict[str, Any]:
         """Read all sensors"""
@@ -188,40 +171,28 @@ class HardwareController:
         }
     
     def test_all_components(self) -> Dict[str, bool]:
-        """Test all hardware components"""
-        results = {}
-        
-        try:
-            # Test display
-            self.display.show_message("Test Display", duration=1)
-            results['display'] = True
-        except Exception as e:
-            self.logger.error(f"Display test failed: {e}")
-            results['display'] = False
-        
-        try:
-            # Test LEDs
-            self.leds.flash_all_leds(count=2, interval=0.1)
-            results['leds'] = True
-        except Exception as e:
-            self.logger.error(f"LED test failed: {e}")
-            results['leds'] = False
+        """Test all hardware components
         
-        try:
-            # Test sensors
-            sensor_data = self.sensors.read_sensors()
-            results['sensors'] = sensor_data is not None
-        except Exception as e:
-            self.logger.error(f"Sensor test failed: {e}")
-            results['sensors'] = False
+        The components are independent, so the tests run concurrently and
+        take about as long as the slowest one (the LED flash).
+        """
+        tests = {
+            'display': lambda: self.display.show_message("Test Display", duration=1) or True,
+            'leds': lambda: self.leds.flash_all_leds(count=2, interval=0.1) or True,
+            'sensors': lambda: self.sensors.read_sensors() is not None,
+            'buttons': lambda: self.buttons.get_button_states() is not None,
+        }
+        results = {}
         
-        try:
-            # Test buttons
-            button_states = self.buttons.get_button_states()
-            results['buttons'] = button_states is not None
-        except Exception as e:
-            self.logger.error(f"Button test failed: {e}")
-            results['buttons'] = False
+        with ThreadPoolExecutor(max_workers=len(tests)) as executor:
+            futures = {name: executor.submit(test) for name, test in tests.items()}
+            
+            for name, future in futures.items():
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    self.logger.error(f"{name.capitalize()} test failed: {e}")
+                    results[name] = False
         
         return results
     
@@ -230,10 +201,6 @@ class HardwareController:
         self.running = False
         
         try:
-            # Wait for sensor thread to finish
-            if self.sensor_thread and self.sensor_thread.is_alive():
-                self.sensor_thread.join(timeout=2)
-            
             # Cleanup all components
             self.leds.cleanup()
             self.display.cleanup()
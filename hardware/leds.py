@@ -40,11 +40,34 @@ class LEDController:
             'led2_green': False
         }
         
+        # LED names in a fixed order, and the all-off / all-on states built once
+        self._led_names = tuple(self.led_pins)
+        self._all_leds_off = self._leds_only()
+        self._all_leds_on = self._leds_only(*self._led_names)
+        
         # Pattern control
         self.current_pattern = None
+        self.pattern_lock = threading.RLock()  # flash_all_leds restores the pattern while holding it
+        
+        # Animated patterns: LED states cycled by one long-lived pattern thread
         self.pattern_thread = None
         self.pattern_running = False
-        self.pattern_lock = threading.Lock()
+        self._pattern_steps = None  # List of set_led_states() dicts, None = static
+        self._pattern_interval = 0.0
+        self._pattern_index = 0
+        self._pattern_deadline = 0.0  # time.monotonic() of the next step
+        self._pattern_wake = threading.Event()
+        
+        # Pattern functions by name
+        self._pattern_handlers = {
+            'LIBERO': self._pattern_free,
+            'OCCUPATO': self._pattern_occupied,
+            'IN_CODA': self._pattern_queue,
+            'RISERVATO_ATTESA': self._pattern_reserved,
+            'WARNING_TIMEOUT': self._pattern_warning,
+            'ERROR': self._pattern_error,
+            'OFF': self._set_all_leds_off,
+        }
         
         self.initialized = False
         
@@ -81,20 +104,36 @@ class LEDController:
     
     def set_led_state(self, led_name: str, state: bool):
         """Set individual LED state"""
-        if led_name not in self.led_pins:
-            self.logger.warning(f"Unknown LED: {led_name}")
+        self.set_led_states({led_name: state})
+    
+    def set_led_states(self, states: Dict[str, bool]):
+        """Set several LEDs at once, with a single GPIO write"""
+        changed = {}
+        for led_name, state in states.items():
+            if led_name not in self.led_pins:
+                self.logger.warning(f"Unknown LED: {led_name}")
+            elif self.led_states[led_name] != state:
+                changed[led_name] = state  # Already set LEDs skip the write
+        
+        if not changed:
             return
         
-        self.led_states[led_name] = state
+        self.led_states.update(changed)
         
         if self.simulation_mode:
-            status = "ON" if state else "OFF"
-            self.logger.info(f"[LED] {led_name.upper()}: {status}")
+            for led_name, state in changed.items():
+                status = "ON" if state else "OFF"
+                self.logger.info(f"[LED] {led_name.upper()}: {status}")
             return
         
-        if not self.simulation_mode and GPIO:
-            pin = self.led_pins[led_name]
-            GPIO.output(pin, GPIO.HIGH if state else GPIO.LOW)
+        if GPIO:
+            # RPi.GPIO accepts lists of channels and values
+            GPIO.output([self.led_pins[led_name] for led_name in changed],
+                        [GPIO.HIGH if state else GPIO.LOW for state in changed.values()])
+    
+    def _leds_only(self, *led_names: str) -> Dict[str, bool]:
+        """States turning on just the given LEDs (all others off)"""
+        return {led_name: led_name in led_names for led_name in self._led_names}
     
     def get_led_states(self) -> Dict[str, bool]:
         """Get current LED states"""
@@ -102,53 +141,41 @@ class LEDController:
     
     def _set_all_leds_off(self):
         """Turn off all LEDs"""
-        for led_name in self.led_pins.keys():
-            self.set_led_state(led_name, False)
+        self.set_led_states(self._all_leds_off)
     
     def _set_all_leds_on(self):
         """Turn on all LEDs"""
-        for led_name in self.led_pins.keys():
-            self.set_led_state(led_name, True)
+        self.set_led_states(self._all_leds_on)
     
     def set_led_pattern(self, pattern: str):
         """Set LED pattern based on system state"""
         with self.pattern_lock:
+            if pattern == self.current_pattern:
+                return  # Already showing it (don't restart a blinking pattern)
+            
             # Stop any existing pattern
             self._stop_pattern()
             
             self.current_pattern = pattern
             
-            if pattern == 'LIBERO':
-                self._pattern_free()
-            elif pattern == 'OCCUPATO':
-                self._pattern_occupied()
-            elif pattern == 'IN_CODA':
-                self._pattern_queue()
-            elif pattern == 'RISERVATO_ATTESA':
-                self._pattern_reserved()
-            elif pattern == 'WARNING_TIMEOUT':
-                self._pattern_warning()
-            elif pattern == 'ERROR':
-                self._pattern_error()
-            elif pattern == 'OFF':
-                self._set_all_leds_off()
+            apply_pattern = self._pattern_handlers.get(pattern)
+            if apply_pattern:
+                apply_pattern()
             else:
                 self.logger.warning(f"Unknown LED pattern: {pattern}")
     
     def _pattern_free(self):
         """LED pattern for free office - Green solid"""
-        self._set_all_leds_off()
-        self.set_led_state('led1_green', True)  # Button LED green
-        self.set_led_state('led2_green', True)  # Status LED green
+        # Button LED and status LED green
+        self.set_led_states(self._leds_only('led1_green', 'led2_green'))
         
         if self.simulation_mode:
             self.logger.info("[LED PATTERN] LIBERO: Verde fisso")
     
     def _pattern_occupied(self):
         """LED pattern for occupied office - Red solid"""
-        self._set_all_leds_off()
-        self.set_led_state('led1_red', True)   # Button LED red
-        self.set_led_state('led2_red', True)   # Status LED red
+        # Button LED and status LED red
+        self.set_led_states(self._leds_only('led1_red', 'led2_red'))
         
         if self.simulation_mode:
             self.logger.info("[LED PATTERN] OCCUPATO: Rosso fisso")
@@ -192,75 +219,76 @@ class LEDController:
     
     def _pattern_error(self):
         """LED pattern for system error - Status LED red, button off"""
-        self._set_all_leds_off()
-        self.set_led_state('led2_red', True)  # Only status LED red
+        self.set_led_states(self._leds_only('led2_red'))  # Only status LED red
         
         if self.simulation_mode:
             self.logger.info("[LED PATTERN] ERROR: Solo LED stato rosso")
     
     def _start_blinking_pattern(self, leds_to_blink: list, interval: float = 1.0):
         """Start blinking pattern for specified LEDs"""
-        self.pattern_running = True
-        self.pattern_thread = threading.Thread(
-            target=self._blinking_loop, 
-            args=(leds_to_blink, interval),
-            daemon=True
-        )
-        self.pattern_thread.start()
+        self._start_pattern_steps([
+            {led_name: True for led_name, _ in leds_to_blink},
+            {led_name: False for led_name, _ in leds_to_blink},
+        ], interval)
     
     def _start_alternating_pattern(self, interval: float = 0.5):
         """Start alternating green/red pattern"""
-        self.pattern_running = True
-        self.pattern_thread = threading.Thread(
-            target=self._alternating_loop, 
-            args=(interval,),
-            daemon=True
-        )
-        self.pattern_thread.start()
+        self._start_pattern_steps([
+            self._leds_only('led1_green', 'led2_green'),  # Green phase
+            self._leds_only('led1_red', 'led2_red'),      # Red phase
+        ], interval)
     
-    def _blinking_loop(self, leds_to_blink: list, interval: float):
-        """Blinking pattern loop"""
-        state = False
-        while self.pattern_running:
-            state = not state
-            
-            for led_name, _ in leds_to_blink:
-                self.set_led_state(led_name, state)
+    def _start_pattern_steps(self, steps: list, interval: float):
+        """Have the pattern thread cycle through steps, one every interval"""
+        with self.pattern_lock:
+            self._pattern_steps = steps
+            self._pattern_interval = interval
+            self._pattern_index = 0
+            self._pattern_deadline = time.monotonic()
             
-            time.sleep(interval)
+            if self.pattern_thread is None:
+                self.pattern_running = True
+                self.pattern_thread = threading.Thread(target=self._pattern_loop, daemon=True)
+                self.pattern_thread.start()
+        
+        self._pattern_wake.set()
     
-    def _alternating_loop(self, interval: float):
-        """Alternating green/red pattern loop"""
-        green_on = True
+    def _pattern_loop(self):
+        """Pattern thread: apply the due step, then wait for the next one
+        
+        Between steps the thread blocks in Event.wait, which releases the GIL,
+        so it only runs Python code for the few GPIO writes of each step.
+        """
         while self.pattern_running:
-            if green_on:
-                # Green phase
-                self.set_led_state('led1_green', True)
-                self.set_led_state('led2_green', True)
-                self.set_led_state('led1_red', False)
-                self.set_led_state('led2_red', False)
-            else:
-                # Red phase
-                self.set_led_state('led1_green', False)
-                self.set_led_state('led2_green', False)
-                self.set_led_state('led1_red', True)
-                self.set_led_state('led2_red', True)
+            timeout = None  # No animated pattern: wait for one to start
             
-            green_on = not green_on
-            time.sleep(interval)
+            with self.pattern_lock:
+                steps = self._pattern_steps
+                if steps:
+                    now = time.monotonic()
+                    if now >= self._pattern_deadline:
+                        self.set_led_states(steps[self._pattern_index])
+                        self._pattern_index = (self._pattern_index + 1) % len(steps)
+                        
+                        # Advance by the interval so the cadence doesn't drift;
+                        # after a stall restart from now
+                        self._pattern_deadline = max(self._pattern_deadline + self._pattern_interval, now)
+                    timeout = self._pattern_deadline - now
+            
+            self._pattern_wake.wait(timeout)
+            self._pattern_wake.clear()
     
     def _stop_pattern(self):
         """Stop current pattern"""
-        self.pattern_running = False
-        if self.pattern_thread and self.pattern_thread.is_alive():
-            self.pattern_thread.join(timeout=1)
-        self.pattern_thread = None
+        with self.pattern_lock:
+            self._pattern_steps = None
     
     def flash_all_leds(self, count: int = 3, interval: float = 0.2):
         """Flash all LEDs for attention"""
         with self.pattern_lock:
             # Stop current pattern
             current_pattern = self.current_pattern
+            self.current_pattern = None
             self._stop_pattern()
             
             if self.simulation_mode:
@@ -283,10 +311,9 @@ class LEDController:
         self.logger.info("Starting LED test sequence")
         
         # Test each LED individually
-        for led_name in self.led_pins.keys():
+        for led_name in self._led_names:
             self.logger.info(f"Testing {led_name}")
-            self._set_all_leds_off()
-            self.set_led_state(led_name, True)
+            self.set_led_states(self._leds_only(led_name))
             time.sleep(0.5)
         
         # Test all patterns
@@ -304,6 +331,14 @@ class LEDController:
         """Clean up LED resources"""
         with self.pattern_lock:
             self._stop_pattern()
+            self.current_pattern = None
             self._set_all_leds_off()
         
+        # Stop the pattern thread
+        self.pattern_running = False
+        self._pattern_wake.set()
+        if self.pattern_thread and self.pattern_thread.is_alive():
+            self.pattern_thread.join(timeout=1)
+        self.pattern_thread = None
+        
         self.logger.info("LED cleanup complete")
@@ -8,6 +8,8 @@ import threading
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional
 import logging
+import statistics
+from collections import namedtuple, deque
 
 try:
     import RPi.GPIO as GPIO
@@ -16,11 +18,25 @@ except ImportError:
     HARDWARE_AVAILABLE = False
     GPIO = None
 
+try:
+    import pigpio  # Optional: hardware-timed echo capture (needs pigpiod)
+except ImportError:
+    pigpio = None
+
 from config.config import Config
 
+# Readings published by the sensor thread. Replaced as a whole, so readers
+# see a consistent set without taking the lock.
+SensorSnapshot = namedtuple('SensorSnapshot', [
+    'pir_movement', 'ultrasonic_distance', 'presence_detected', 'last_movement_ns'
+])
+
 class SensorController:
     """Manages PIR and Ultrasonic sensors"""
     
+    # Ultrasonic readings are the median of the last few echoes
+    DISTANCE_WINDOW = 5
+    
     def __init__(self, simulation_mode: bool = False):
         self.logger = logging.getLogger(__name__)
         self.simulation_mode = simulation_mode
@@ -34,12 +50,22 @@ class SensorController:
         self.initialized = False
         self.pir_movement = False
         self.ultrasonic_distance = 999  # cm
-        self.last_movement_time = None
+        self._distance_window = deque(maxlen=self.DISTANCE_WINDOW)
+        self.last_movement_ns = None  # time.monotonic_ns() of the last movement
         self.presence_detected = False
+        self._snapshot = SensorSnapshot(False, 999, False, None)
         
-        # Threading
+        # pigpio echo capture (None = poll the echo pin with RPi.GPIO)
+        self._pi = None
+        self._echo_callback = None
+        self._echo_rise_tick = None
+        self._echo_distance = 999
+        self._echo_done = threading.Event()
+        
+        # Threading (the lock serializes writers; readers use _snapshot)
         self.sensor_thread = None
         self.running = False
+        self._stop_event = threading.Event()  # Interrupts the loop's waits on cleanup
         self.lock = threading.Lock()
         
         # Simulation data
@@ -56,6 +82,7 @@ class SensorController:
             
             # Start sensor monitoring thread
             self.running = True
+            self._stop_event.clear()
             self.sensor_thread = threading.Thread(target=self._sensor_loop, daemon=True)
             self.sensor_thread.start()
             
@@ -72,8 +99,11 @@ class SensorController:
         if not GPIO:
             raise RuntimeError("GPIO not available")
         
-        # PIR sensor setup
+        # PIR sensor setup: edges are caught by interrupt instead of polling
         GPIO.setup(self.pir_pin, GPIO.IN)
+        if Config.USE_PIR_SENSOR:
+            self._pir_callback(self.pir_pin)  # Initial level
+            GPIO.add_event_detect(self.pir_pin, GPIO.BOTH, callback=self._pir_callback)
         
         # Ultrasonic sensor setup
         GPIO.setup(self.trig_pin, GPIO.OUT)
@@ -83,10 +113,51 @@ class SensorController:
         GPIO.output(self.trig_pin, False)
         time.sleep(0.1)
         
+        self._setup_echo_capture()
+        
         self.logger.info("Hardware sensors GPIO configured")
     
+    def _setup_echo_capture(self):
+        """Time the ultrasonic echo with pigpio edge ticks, if pigpiod is running"""
+        if not pigpio:
+            return
+        
+        pi = pigpio.pi()
+        if not pi.connected:
+            self.logger.info("pigpiod not running, polling the ultrasonic echo")
+            return
+        
+        self._pi = pi
+        self._echo_callback = pi.callback(self.echo_pin, pigpio.EITHER_EDGE, self._echo_edge)
+        self.logger.info("Ultrasonic echo timed by pigpio")
+    
+    def _echo_edge(self, gpio: int, level: int, tick: int):
+        """pigpio edge callback: tick is the edge time in microseconds"""
+        if level == 1:
+            self._echo_rise_tick = tick
+        elif level == 0 and self._echo_rise_tick is not None:
+            pulse_us = pigpio.tickDiff(self._echo_rise_tick, tick)
+            self._echo_rise_tick = None
+            self._echo_distance = pulse_us * 0.01715  # Speed of sound / 2, cm/us
+            self._echo_done.set()
+    
+    def _pir_callback(self, channel: int):
+        """GPIO interrupt callback for PIR level changes
+        
+        Both edges are stamped: the falling edge marks when movement
+        actually stopped, however long the PIR stayed HIGH.
+        """
+        self.pir_movement = GPIO.input(channel) == GPIO.HIGH
+        self.last_movement_ns = time.monotonic_ns()
+    
     def _sensor_loop(self):
-        """Main sensor monitoring loop"""
+        """Main sensor monitoring loop
+        
+        Readings are taken every ULTRASONIC_POLLING_SECONDS against absolute
+        time.monotonic() deadlines, so the time spent reading (up to 100ms
+        per echo timeout) doesn't stretch the period.
+        """
+        deadline = time.monotonic()
         while self.running:
             try:
                 if self.simulation_mode:
@@ -97,25 +168,29 @@ class SensorController:
                 # Update presence detection logic
                 self._update_presence_logic()
                 
-                # Sleep based on config
-                time.sleep(Config.ULTRASONIC_POLLING_SECONDS)
+                # Sleep until the next reading is due
+                deadline += Config.ULTRASONIC_POLLING_SECONDS
+                remaining = deadline - time.monotonic()
+                if remaining > 0:
+                    if self._stop_event.wait(remaining):
+                        break
+                else:
+                    deadline = time.monotonic()  # Fell behind, skip the missed readings
                 
             except Exception as e:
                 self.logger.error(f"Error in sensor loop: {e}")
-                time.sleep(1)
+                if self._stop_event.wait(1):
+                    break
+                deadline = time.monotonic()
     
     def _read_hardware_sensors(self):
-        """Read actual hardware sensors"""
+        """Read actual hardware sensors (the PIR is updated by _pir_callback)"""
         with self.lock:
-            # Read PIR sensor
-            if Config.USE_PIR_SENSOR:
-                self.pir_movement = GPIO.input(self.pir_pin) == GPIO.HIGH
-                if self.pir_movement:
-                    self.last_movement_time = datetime.now()
-            
             # Read ultrasonic sensor
             if Config.USE_ULTRASONIC_SENSOR:
-                self.ultrasonic_distance = self._measure_distance()
+                # Median filter: drops single bad echoes (e.g. a 999 timeout)
+                self._distance_window.append(self._measure_distance())
+                self.ultrasonic_distance = statistics.median(self._distance_window)
     
     def _read_simulated_sensors(self):
         """Read simulated sensor data"""
@@ -124,7 +199,7 @@ class SensorController:
             if time.time() % 10 < 1:  # Movement every 10 seconds
                 self.sim_movement = not self.sim_movement
                 if self.sim_movement:
-                    self.last_movement_time = datetime.now()
+                    self.last_movement_ns = time.monotonic_ns()
             
             self.pir_movement = self.sim_movement
             
@@ -133,31 +208,39 @@ class SensorController:
     
     def _measure_distance(self) -> float:
         """Measure distance using ultrasonic sensor"""
+        if self._pi:
+            return self._measure_distance_pigpio()
+        
         try:
             # Trigger pulse
             GPIO.output(self.trig_pin, True)
             time.sleep(0.00001)  # 10 microseconds
             GPIO.output(self.trig_pin, False)
             
+            # Tight polling loops: local names, integer perf_counter_ns
+            # (the highest resolution clock) and no float math per iteration
+            read_echo = GPIO.input
+            echo_pin = self.echo_pin
+            now_ns = time.perf_counter_ns
+            timeout_ns = 100_000_000  # 100ms timeout
+            
             # Wait for echo start
-            pulse_start = time.time()
-            timeout_start = pulse_start
-            while GPIO.input(self.echo_pin) == 0:
-                pulse_start = time.time()
-                if pulse_start - timeout_start > 0.1:  # 100ms timeout
+            pulse_start = timeout_start = now_ns()
+            while read_echo(echo_pin) == 0:
+                pulse_start = now_ns()
+                if pulse_start - timeout_start > timeout_ns:
                     return 999  # Return max distance on timeout
             
             # Wait for echo end
-            pulse_end = time.time()
-            timeout_end = pulse_end
-            while GPIO.input(self.echo_pin) == 1:
-                pulse_end = time.time()
-                if pulse_end - timeout_end > 0.1:  # 100ms timeout
+            pulse_end = timeout_end = now_ns()
+            while read_echo(echo_pin) == 1:
+                pulse_end = now_ns()
+                if pulse_end - timeout_end > timeout_ns:
                     return 999
             
             # Calculate distance
-            pulse_duration = pulse_end - pulse_start
-            distance = pulse_duration * 17150  # Speed of sound / 2
+            pulse_duration_ns = pulse_end - pulse_start
+            distance = pulse_duration_ns * 0.00001715  # Speed of sound / 2, cm/ns
             
             return min(distance, 999)  # Cap at 999cm
             
@@ -165,53 +248,97 @@ class SensorController:
             self.logger.error(f"Error measuring distance: {e}")
             return 999
     
+    def _measure_distance_pigpio(self) -> float:
+        """Measure distance from the echo edges captured by pigpio"""
+        try:
+            self._echo_done.clear()
+            self._echo_rise_tick = None
+            self._pi.gpio_trigger(self.trig_pin, 10, 1)  # 10 microseconds pulse
+            
+            if not self._echo_done.wait(0.1):  # 100ms timeout
+                return 999
+            
+            return min(self._echo_distance, 999)  # Cap at 999cm
+            
+        except Exception as e:
+            self.logger.error(f"Error measuring distance: {e}")
+            return 999
+    
     def _update_presence_logic(self):
         """Update presence detection based on sensor combination"""
         with self.lock:
-            # Check if object is within presence threshold
-            distance_presence = self.ultrasonic_distance < Config.PRESENCE_THRESHOLD_CM
-            
-            # Check if recent movement detected
-            movement_presence = False
-            if self.last_movement_time:
-                time_since_movement = datetime.now() - self.last_movement_time
-                movement_presence = time_since_movement.total_seconds() < (Config.MOVEMENT_TIMEOUT_MINUTES * 60)
+            if not (Config.USE_PIR_SENSOR or Config.USE_ULTRASONIC_SENSOR):
+                # No sensor enabled: nothing to combine
+                self.presence_detected = False
+            else:
+                # Check if object is within presence threshold
+                distance_presence = self.ultrasonic_distance < Config.PRESENCE_THRESHOLD_CM
+                
+                # Combine sensors based on configuration; the movement
+                # timeout is only checked when it can change the result
+                if Config.DUAL_SENSOR_MODE == 'AND':
+                    # Both sensors must agree
+                    self.presence_detected = distance_presence and (self.pir_movement or self._recent_movement())
+                else:  # 'OR'
+                    # Either sensor can detect presence
+                    self.presence_detected = distance_presence or self._recent_movement()
             
-            # Combine sensors based on configuration
-            if Config.DUAL_SENSOR_MODE == 'AND':
-                # Both sensors must agree
-                self.presence_detected = distance_presence and (self.pir_movement or movement_presence)
-            else:  # 'OR'
-                # Either sensor can detect presence
-                self.presence_detected = distance_presence or movement_presence
+            self._snapshot = SensorSnapshot(
+                self.pir_movement, self.ultrasonic_distance,
+                self.presence_detected, self._last_movement_ns()
+            )
+    
+    def _last_movement_ns(self) -> Optional[int]:
+        """time.monotonic_ns() of the last movement, now while the PIR is HIGH
+        
+        A retriggering PIR stays HIGH through continuous motion without
+        new edges, so a HIGH level counts as movement happening now.
+        """
+        if self.pir_movement:
+            return time.monotonic_ns()
+        return self.last_movement_ns
+    
+    def _recent_movement(self) -> bool:
+        """Check if movement was detected within MOVEMENT_TIMEOUT_MINUTES"""
+        last_movement_ns = self._last_movement_ns()
+        if last_movement_ns is None:
+            return False
+        time_since_movement_ns = time.monotonic_ns() - last_movement_ns
+        return time_since_movement_ns < Config.MOVEMENT_TIMEOUT_MINUTES * 60 * 1_000_000_000
     
     def read_sensors(self) -> Dict[str, Any]:
         """Get current sensor readings"""
-        with self.lock:
-            return {
-                'pir_movement': self.pir_movement,
-                'ultrasonic_distance_cm': round(self.ultrasonic_distance, 1),
-                'presence_detected': self.presence_detected,
-                'last_movement_time': self.last_movement_time,
-                'last_sensor_read': datetime.now(),
-                'sensors_enabled': {
-                    'pir': Config.USE_PIR_SENSOR,
-                    'ultrasonic': Config.USE_ULTRASONIC_SENSOR
-                },
-                'sensor_mode': Config.DUAL_SENSOR_MODE
-            }
+        snapshot = self._snapshot
+        return {
+            'pir_movement': snapshot.pir_movement,
+            'ultrasonic_distance_cm': round(snapshot.ultrasonic_distance, 1),
+            'presence_detected': snapshot.presence_detected,
+            'last_movement_time': self._to_datetime(snapshot.last_movement_ns),
+            'last_sensor_read': datetime.now(),
+            'sensors_enabled': {
+                'pir': Config.USE_PIR_SENSOR,
+                'ultrasonic': Config.USE_ULTRASONIC_SENSOR
+            },
+            'sensor_mode': Config.DUAL_SENSOR_MODE
+        }
+    
+    @staticmethod
+    def _to_datetime(monotonic_ns: Optional[int]) -> Optional[datetime]:
+        """Convert a time.monotonic_ns() timestamp to wall-clock time"""
+        if monotonic_ns is None:
+            return None
+        return datetime.now() - timedelta(microseconds=(time.monotonic_ns() - monotonic_ns) // 1000)
     
     def get_presence_status(self) -> bool:
         """Get simple presence status"""
-        with self.lock:
-            return self.presence_detected
+        return self._snapshot.presence_detected
     
     def simulate_movement(self):
         """Simulate movement for testing"""
         if self.simulation_mode:
             with self.lock:
                 self.sim_movement = True
-                self.last_movement_time = datetime.now()
+                self.last_movement_ns = time.monotonic_ns()
                 self.logger.info("Simulated movement triggered")
     
     def simulate_presence(self, present: bool = True):
@@ -223,26 +350,38 @@ class SensorController:
     
     def get_movement_time_ago(self) -> Optional[int]:
         """Get seconds since last movement"""
-        if not self.last_movement_time:
+        last_movement_ns = self._last_movement_ns()  # Set by the PIR callback thread
+        if last_movement_ns is None:
             return None
         
-        time_diff = datetime.now() - self.last_movement_time
-        return int(time_diff.total_seconds())
+        return (time.monotonic_ns() - last_movement_ns) // 1_000_000_000
     
     def is_movement_warning_needed(self) -> bool:
         """Check if movement warning should be shown"""
-        time_ago = self.get_movement_time_ago()
-        if time_ago is None:
+        last_movement_ns = self._last_movement_ns()
+        if last_movement_ns is None:
             return False
         
-        warning_seconds = Config.MOVEMENT_WARNING_MINUTES * 60
-        return time_ago >= warning_seconds
+        warning_ns = Config.MOVEMENT_WARNING_MINUTES * 60 * 1_000_000_000
+        return time.monotonic_ns() - last_movement_ns >= warning_ns
     
     def cleanup(self):
         """Clean up sensor resources"""
         self.running = False
+        self._stop_event.set()
         
         if self.sensor_thread and self.sensor_thread.is_alive():
             self.sensor_thread.join(timeout=2)
         
+        if not self.simulation_mode and GPIO and Config.USE_PIR_SENSOR:
+            try:
+                GPIO.remove_event_detect(self.pir_pin)
+            except Exception:
+                pass  # Ignore errors during cleanup
+        
+        if self._pi:
+            self._echo_callback.cancel()
+            self._pi.stop()
+            self._pi = None
+        
         self.logger.info("Sensors cleanup complete")
@@ -9,31 +9,22 @@ from datetime import datetime
 
 from config.config import Config
 
-def setup_logger(name: str = 'QueueManager') -> logging.Logger:
-    """Setup logger with file and console handlers"""
-    
-    # Create logger
-    logger = logging.getLogger(name)
-    
-    # Prevent duplicate handlers
-    if logger.handlers:
-        return logger
-    
-    # Set level from config
-    level = getattr(logging, Config.LOG_LEVEL.upper(), logging.INFO)
-    logger.setLevel(level)
-    
-    # Create formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        datefmt='%Y-%m-%d %H:%M:%S'
-    )
+# Shared by every logger set up here
+_FORMATTER = logging.Formatter(
+    '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+_handlers = []  # Console and file handler, created on first setup_logger call
+
+def _get_handlers(logger: logging.Logger) -> list:
+    """Create the shared console and rotating file handlers once"""
+    if _handlers:
+        return _handlers
     
     # Console handler
     console_handler = logging.StreamHandler()
-    console_handler.setLevel(level)
-    console_handler.setFormatter(formatter)
-    logger.addHandler(console_handler)
+    console_handler.setFormatter(_FORMATTER)
+    _handlers.append(console_handler)
     
     # File handler with rotation
     try:
@@ -42,18 +33,37 @@ def setup_logger(name: str = 'QueueManager') -> logging.Logger:
         if log_dir:
             os.makedirs(log_dir, exist_ok=True)
         
-        # Rotating file handler
+        # Rotating file handler (the file is opened on the first record)
         file_handler = logging.handlers.RotatingFileHandler(
             Config.LOG_FILE,
             maxBytes=Config.LOG_MAX_BYTES,
-            backupCount=Config.LOG_BACKUP_COUNT
+            backupCount=Config.LOG_BACKUP_COUNT,
+            delay=True
         )
-        file_handler.setLevel(level)
-        file_handler.setFormatter(formatter)
-        logger.addHandler(file_handler)
+        file_handler.setFormatter(_FORMATTER)
+        _handlers.append(file_handler)
         
     except Exception as e:
         logger.warning(f"Failed to setup file logging: {e}")
     
+    return _handlers
+
+def setup_logger(name: str = 'QueueManager') -> logging.Logger:
+    """Setup logger with file and console handlers"""
+    
+    # Create logger
+    logger = logging.getLogger(name)
+    
+    # Prevent duplicate handlers
+    if logger.handlers:
+        return logger
+    
+    # Set level from config (the handlers pass everything the logger does)
+    level = getattr(logging, Config.LOG_LEVEL.upper(), logging.INFO)
+    logger.setLevel(level)
+    
+    for handler in _get_handlers(logger):
+        logger.addHandler(handler)
+    
     logger.info(f"Logger '{name}' initialized with level {Config.LOG_LEVEL}")
     return logger
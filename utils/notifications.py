@@ -4,12 +4,29 @@ Handles Pushover notifications (optional)
 """
 
 import logging
+import queue
+import threading
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from typing import Dict, Any, Optional
 from datetime import datetime
 
 from config.config import Config
 
+PUSHOVER_URL = 'https://api.pushover.net/1/messages.json'
+
+# Pushover priority by message type (types not listed use the default)
+PRIORITY_MAP = {
+    'system_error': 1,            # High priority
+    'timeout_warning': 1,
+    'your_turn': 0,               # Normal priority
+    'no_show': 0,
+    'reservation_confirmed': -1,  # Low priority
+    'queue_cleared': -1,
+    'system_reset': -1,
+}
+
 class NotificationManager:
     """Manages push notifications via Pushover API"""
     
@@ -19,6 +36,13 @@ class NotificationManager:
         self.user_key = Config.PUSHOVER_USER_KEY
         self.api_token = Config.PUSHOVER_API_TOKEN
         
+        # Notifications are posted by a background sender thread over one
+        # keep-alive session, so callers never wait on the HTTP request
+        self._send_queue = queue.Queue()
+        self._sender_thread = None
+        self._sender_lock = threading.Lock()
+        self._session = None
+        
         # Notification templates
         self.templates = {
             'reservation_confirmed': "✅ Prenotazione confermata! Posizione in coda: {position}. Attesa stimata: {wait_time} min",
@@ -39,7 +63,11 @@ class NotificationManager:
                          message_type: str, 
                          user_code: Optional[str] = None,
                          **kwargs) -> bool:
-        """Send notification to user"""
+        """Send notification to user
+        
+        Returns once the notification is queued; delivery is logged by the
+        sender thread.
+        """
         
         if not self.enabled:
             self.logger.debug(f"Notification not sent (disabled): {message_type}")
@@ -57,7 +85,7 @@ class NotificationManager:
                 return False
             
             # Format message
-            message = template.format(**kwargs)
+            message = template.format_map(kwargs)
             
             # Prepare notification data
             data = {
@@ -77,38 +105,55 @@ class NotificationManager:
             if priority is not None:
                 data['priority'] = priority
             
-            # Send notification
-            response = requests.post(
-                'https://api.pushover.net/1/messages.json',
+            # Queue for the sender thread
+            self._send_queue.put((message_type, user_code, data))
+            self._ensure_sender()
+            return True
+                
+        except Exception as e:
+            self.logger.error(f"Error sending notification: {e}")
+            return False
+    
+    def _ensure_sender(self):
+        """Start the background sender thread on first use"""
+        with self._sender_lock:
+            if self._sender_thread is None:
+                self._sender_thread = threading.Thread(target=self._sender_loop, daemon=True)
+                self._sender_thread.start()
+    
+    def _sender_loop(self):
+        """Background thread posting queued notifications"""
+        self._session = requests.Session()
+        # Retry only failed connections: after a read timeout or a 5xx,
+        # Pushover may already have delivered the message
+        retries = Retry(total=2, connect=2, read=0, status=0, backoff_factor=1)
+        self._session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=1,
+                                                    max_retries=retries))
+        
+        while True:
+            message_type, user_code, data = self._send_queue.get()
+            self._post(message_type, user_code, data)
+    
+    def _post(self, message_type: str, user_code: Optional[str], data: Dict[str, Any]):
+        """Post one notification to Pushover"""
+        try:
+            response = self._session.post(
+                PUSHOVER_URL,
                 data=data,
                 timeout=10
             )
             
             if response.status_code == 200:
                 self.logger.info(f"Notification sent: {message_type} to {user_code or 'all'}")
-                return True
             else:
                 self.logger.error(f"Failed to send notification: {response.status_code} - {response.text}")
-                return False
                 
         except Exception as e:
             self.logger.error(f"Error sending notification: {e}")
-            return False
     
     def _get_priority(self, message_type: str) -> Optional[int]:
         """Get notification priority based on message type"""
-        high_priority = ['system_error', 'timeout_warning']
-        normal_priority = ['your_turn', 'no_show']
-        low_priority = ['reservation_confirmed', 'queue_cleared', 'system_reset']
-        
-        if message_type in high_priority:
-            return 1  # High priority
-        elif message_type in normal_priority:
-            return 0  # Normal priority
-        elif message_type in low_priority:
-            return -1  # Low priority
-        
-        return None  # Default priority
+        return PRIORITY_MAP.get(message_type)  # None = default priority
     
     def send_reservation_confirmed(self, user_code: str, position: int, wait_time: int) -> bool:
         """Send reservation confirmed notification"""
@@ -148,29 +193,10 @@ class NotificationManager:
             user_code=user_code
         )
     
-    def send_your_turn_notification(self, user_code: str, timeout_minutes: int = 3) -> bool:
-        """Send 'your turn' notification to user"""
-        return self.send_notification(
-            'your_turn', 
-            user_code=user_code,
-            timeout=timeout_minutes
-        )
-    
-    def send_no_show_notification(self, user_code: str) -> bool:
-        """Send no-show notification to user"""
-        return self.send_notification(
-            'no_show', 
-            user_code=user_code
-        )
-    
-    def send_reservation_confirmation(self, user_code: str, position: int, wait_time: int) -> bool:
-        """Send reservation confirmation notification to user"""
-        return self.send_notification(
-            'reservation_confirmed', 
-            user_code=user_code,
-            position=position,
-            wait_time=wait_time
-        )
+    # Names used by app.py and the API for the same notifications
+    send_your_turn_notification = send_your_turn
+    send_no_show_notification = send_no_show
+    send_reservation_confirmation = send_reservation_confirmed
     
     def send_queue_cleared(self) -> bool:
         """Send queue cleared notification"""